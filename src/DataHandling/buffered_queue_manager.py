@@ -1,11 +1,14 @@
+import collections
+import os
 import queue
 import threading
 import time
 
-from typing import Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from src.DataHandling.trajectory_pair import Trajectory, TrajectoryPair
 from src.DataHandling.database_manager import DBManager
+from src.DataHandling.queue_journal import QueueJournal, QUEUED, RENDERED, SERVED, DECIDED
 from src.DataHandling.video_extractor import VideoExtractor
 
 class BufferedQueueManager():
@@ -15,9 +18,15 @@ class BufferedQueueManager():
     This class creates a queue that is continuously refilled in a separate thread. It retrieves
     trajectory pairs from a database using a DBManager, generates videos using a VideoExtractor,
     and stores them in the queue for later retrieval.
+
+    If a QueueJournal is given, the pairs are journaled as they are queued, rendered, served and decided.
+    On startup the pending pairs of the journal are put back into the queue first, reusing their videos
+    if they still exist. Served pairs that are not decided within serve_timeout return to the queue.
     """
 
-    def __init__(self, db_manager: DBManager, video_extractor:VideoExtractor, n: int = 10, sleep_interval: int =5, daemon = True):
+    def __init__(self, db_manager: DBManager, video_extractor:VideoExtractor, n: int = 10, sleep_interval: int =5, daemon = True,
+                 journal: Optional[QueueJournal] = None, serve_timeout: float = 600, render_size: Optional[Tuple[int, int]] = None,
+                 n_workers: int = 1):
         """
         Initializes the BufferedQueueManager with a database manager, video extractor, queue size, and sleep interval.
 
@@ -26,20 +35,57 @@ class BufferedQueueManager():
             video_extractor (VideoExtractor): An instance of VideoExtractor to generate videos from trajectories.
             n (int): The maximum size of the buffered queue.
             sleep_interval (int): The interval between queue refills in seconds.
+            journal (Optional[QueueJournal]): The journal used to recover the queue after a restart.
+            serve_timeout (float): The time in seconds after which an undecided served pair returns to the queue.
+            render_size (Optional[Tuple[int, int]]): The (width, height) of the videos. Defaults to the render size of the env.
+            n_workers (int): The number of threads refilling the queue. Can be changed with set_workers.
         """        
         self.buffered_queue = queue.Queue(maxsize=n)
         self.db_manager: DBManager = db_manager
         self.video_extractor: VideoExtractor = video_extractor
+        self.journal = journal
+        self.serve_timeout = serve_timeout
+        self.render_size = render_size
+
+        self.served: Dict[str, Tuple[Tuple[TrajectoryPair, str, str], float]] = {}
+        self.served_lock = threading.Lock()
+        self.returned_entries = collections.deque()
+        self.pending_recovery = collections.deque()
+        self.evicted_pairs = collections.deque()
+        self.hot_limit: Optional[int] = None
+        self.last_served_at = time.time()
+        self.waiting = 0
+        if journal is not None:
+            self.pending_recovery.extend(journal.pending())
+            db_manager.resume_after(journal.cursor)
 
         self.sleep_interval = sleep_interval
         self.run = True
-        self.refilling_thread = threading.Thread(target=self.refill_loop)
-        self.refilling_thread.daemon = daemon
-        self.refilling_thread.start()
+        self.daemon = daemon
+        self.n_workers = 0
+        self.workers = []
+        self.set_workers(n_workers)
+        self.refilling_thread = self.workers[0]
+
+    def set_workers(self, n_workers: int):
+        """
+        Sets the number of threads refilling the queue. Surplus threads finish their current entry and stop.
+
+        Args:
+            n_workers (int): The new number of threads, at least one.
+        """
+        self.n_workers = max(1, n_workers)
+        self.workers = [worker for worker in self.workers if worker.is_alive()]
+        for worker_index in range(len(self.workers), self.n_workers):
+            worker = threading.Thread(target=self.refill_loop, args=(worker_index,))
+            worker.daemon = self.daemon
+            worker.start()
+            self.workers.append(worker)
 
     def _generate_videos_from_trajectory_pair(self, trajectory_pair: TrajectoryPair) -> Tuple[str, str]:
         """
-        Generates video file paths from a given trajectory pair.
+        Generates video file paths from a given trajectory pair. For segment pairs only the frames of the
+        segments are rendered.
 
         Args:
             trajectory_pair (TrajectoryPair): A pair of trajectories for which to generate videos.
@@ -47,24 +93,48 @@ class BufferedQueueManager():
         Returns:
             Tuple[str, str]: A tuple containing the file paths of the generated videos.
         """
-        frames1 = self.video_extractor.recreate_frames_from_trajectory(trajectory_pair.trajectory1)
-        frames2 = self.video_extractor.recreate_frames_from_trajectory(trajectory_pair.trajectory2)
+        size = {'width': self.render_size[0], 'height': self.render_size[1]} if self.render_size else {}
+        if trajectory_pair.is_segment_pair:
+            frames1 = self.video_extractor.recreate_frames_from_segment(trajectory_pair.trajectory1, trajectory_pair.segment1, **size)
+            frames2 = self.video_extractor.recreate_frames_from_segment(trajectory_pair.trajectory2, trajectory_pair.segment2, **size)
+        else:
+            frames1 = self.video_extractor.recreate_frames_from_trajectory(trajectory_pair.trajectory1, **size)
+            frames2 = self.video_extractor.recreate_frames_from_trajectory(trajectory_pair.trajectory2, **size)
 
         video_file_path_1 = self.video_extractor.generate_video(frames1)
         video_file_path_2 = self.video_extractor.generate_video(frames2)
 
         return video_file_path_1, video_file_path_2
     
-    def refill_loop(self):
+    def refill_loop(self, worker_index: int = 0):
         """
-        Continuously refills the queue with new entries. Runs as a separate thread.
+        Continuously refills the queue with new entries. Runs as a separate thread per worker.
+        Returned and recovered pairs are put into the queue before new entries are taken from the database.
         """
-        while self.run:
-            if self.get_queue_size() < self.get_queue_max():
+        while self.run and worker_index < self.n_workers:
+            self._return_abandoned_entries()
+            if self.get_queue_size() < self._rendered_ahead_max():
+                entry = _pop(self.returned_entries)
+                if entry is not None:
+                    self.buffered_queue.put(entry)
+                    continue
+                trajectory_pair = _pop(self.evicted_pairs)
+                if trajectory_pair is not None:
+                    video1, video2 = self._generate_videos_from_trajectory_pair(trajectory_pair)
+                    self._record(RENDERED, trajectory_pair, video1=video1, video2=video2)
+                    self.buffered_queue.put((trajectory_pair, video1, video2))
+                    continue
+                pair_id = _pop(self.pending_recovery)
+                if pair_id is not None:
+                    self._recover_entry(pair_id)
+                    continue
+
                 new_entry, error = self.db_manager.get_next_entry()
                 print(error)
                 if new_entry is not None:
+                    self._record(QUEUED, new_entry)
                     video1, video2 = self._generate_videos_from_trajectory_pair(new_entry)
+                    self._record(RENDERED, new_entry, video1=video1, video2=video2)
                     print(f"New entry: {new_entry} with videos {video1} and {video2}")
                     self.buffered_queue.put((new_entry, video1, video2))
                 else:
@@ -72,14 +142,133 @@ class BufferedQueueManager():
                     time.sleep(self.sleep_interval)
             time.sleep(self.sleep_interval)       
 
+    def _recover_entry(self, pair_id: str):
+        """
+        Puts a pending pair of the journal back into the queue. Its videos are only rendered again if they no longer exist.
+
+        Args:
+            pair_id (str): The ID of the pending pair.
+        """
+        trajectory_pair, error = self.db_manager.fetch_entry_by_id(pair_id)
+        if trajectory_pair is None:
+            print(error)
+            if error == "No matching entry found.":
+                self.journal.record(DECIDED, pair_id)
+            else:
+                # The database is not reachable (yet), try again later.
+                self.pending_recovery.append(pair_id)
+                time.sleep(self.sleep_interval)
+            return
+        if trajectory_pair.preference is not None or trajectory_pair.skipped:
+            self.journal.record(DECIDED, pair_id)
+            return
+
+        state = self.journal.get_state(pair_id) or {}
+        video1, video2 = state.get('video1'), state.get('video2')
+        if not (video1 and video2 and os.path.exists(video1) and os.path.exists(video2)):
+            video1, video2 = self._generate_videos_from_trajectory_pair(trajectory_pair)
+            self.journal.record(RENDERED, pair_id, video1=video1, video2=video2)
+        print(f"Recovered entry: {trajectory_pair} with videos {video1} and {video2}")
+        self.buffered_queue.put((trajectory_pair, video1, video2))
+
+    def _return_abandoned_entries(self):
+        """
+        Moves served entries that have not been decided within serve_timeout back to the queue.
+        """
+        now = time.time()
+        with self.served_lock:
+            abandoned = [pair_id for pair_id, (_, served_at) in self.served.items() if now - served_at > self.serve_timeout]
+            for pair_id in abandoned:
+                entry, _ = self.served.pop(pair_id)
+                self.returned_entries.append(entry)
+
+    def _rendered_ahead_max(self) -> int:
+        if self.hot_limit is None:
+            return self.get_queue_max()
+        return min(self.hot_limit, self.get_queue_max())
+
+    def limit_rendered_ahead(self, hot_limit: Optional[int]) -> List[str]:
+        """
+        Limits the number of rendered pairs waiting in the queue, e.g. when the disk budget is exceeded.
+        Queued pairs beyond the limit are evicted and rendered again once they are needed.
+
+        Args:
+            hot_limit (Optional[int]): The number of pairs to keep rendered ahead. None lifts the limit.
+
+        Returns:
+            List[str]: The video file paths of the evicted pairs, which are no longer in use.
+        """
+        self.hot_limit = hot_limit
+        if hot_limit is None:
+            return []
+
+        with self.buffered_queue.mutex:
+            entries = list(self.buffered_queue.queue)
+            if len(entries) <= hot_limit:
+                return []
+            self.buffered_queue.queue.clear()
+            self.buffered_queue.queue.extend(entries[:hot_limit])
+            self.buffered_queue.not_full.notify_all()
+
+        evicted = entries[hot_limit:]
+        self.evicted_pairs.extendleft(reversed([trajectory_pair for trajectory_pair, _, _ in evicted]))
+        return [video for _, video1, video2 in evicted for video in (video1, video2)]
+
+    def active_videos(self) -> Set[str]:
+        """
+        Returns the absolute paths of all videos that are queued, served or waiting to be recovered and must not be deleted.
+        """
+        with self.buffered_queue.mutex:
+            entries = list(self.buffered_queue.queue)
+        with self.served_lock:
+            entries += [entry for entry, _ in self.served.values()]
+        entries += list(self.returned_entries)
+
+        videos = [video for _, video1, video2 in entries for video in (video1, video2)]
+        if self.journal is not None:
+            for pair_id in list(self.pending_recovery):
+                state = self.journal.get_state(pair_id) or {}
+                videos += [state[key] for key in ('video1', 'video2') if state.get(key)]
+        return {os.path.abspath(video) for video in videos}
+
+    def _record(self, event: str, trajectory_pair: TrajectoryPair, **data):
+        if self.journal is not None and trajectory_pair.pair_id is not None:
+            self.journal.record(event, trajectory_pair.pair_id, **data)
+
     def get_next_entry(self) -> Tuple[Trajectory, str, str]:
         """
-        Retrieves the next entry from the queue.
+        Retrieves the next entry from the queue and marks it as served.
 
         Returns:
             Tuple(Trajectory, str, str): The next entry of the queue.
         """
-        return self.buffered_queue.get(block=True)
+        with self.served_lock:
+            self.waiting += 1
+        try:
+            entry = self.buffered_queue.get(block=True)
+        finally:
+            with self.served_lock:
+                self.waiting -= 1
+        self.last_served_at = time.time()
+        trajectory_pair = entry[0]
+        if trajectory_pair.pair_id is not None:
+            with self.served_lock:
+                self.served[trajectory_pair.pair_id] = (entry, time.time())
+            self._record(SERVED, trajectory_pair)
+        return entry
+
+    def mark_decided(self, trajectory_pair: TrajectoryPair):
+        """
+        Marks a served pair as labeled or skipped, so that it is neither returned to the queue nor recovered after a restart.
+
+        Args:
+            trajectory_pair (TrajectoryPair): The decided pair.
+        """
+        if trajectory_pair.pair_id is None:
+            return
+        with self.served_lock:
+            self.served.pop(trajectory_pair.pair_id, None)
+        self._record(DECIDED, trajectory_pair)
 
     def get_queue_size(self) -> int:
         """
@@ -102,4 +291,11 @@ class BufferedQueueManager():
     def close_routine(self):
         self.run = False
         print("Closing queue")
-        self.refilling_thread.join()  # Wait for the thread to finish
+        for worker in self.workers:
+            worker.join()  # Wait for the threads to finish
+
+def _pop(entries: collections.deque):
+    try:
+        return entries.popleft()
+    except IndexError:
+        return None
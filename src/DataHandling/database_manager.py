@@ -1,11 +1,15 @@
+import re
 import subprocess
+import threading
 import numpy as np
 import os
 import shutil
 
+from bson import ObjectId
 from pymongo import MongoClient, errors
 from typing import Tuple, Optional
-from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectoryPair
+from src.DataHandling.payload_codec import PayloadCodec
+from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectorySegment, TrajectoryPair, segment_to_dict, trajectory_to_dict
 
 class DBManager:
     """
@@ -15,26 +19,43 @@ class DBManager:
         client (MongoClient): The MongoDB client for database operations.
         db: The MongoDB database instance.
         collection: The MongoDB collection for storing video data.
+        trajectories: The MongoDB collection for storing the long trajectories segments are cut from.
         id_of_current_video: The ID of the current video being processed (for sequential access).
 
     Methods:
         add_entry: Adds a new trajectory pair entry to the database.
+        add_trajectory: Adds a trajectory that segment pairs can reference.
+        fetch_trajectory: Retrieves a stored trajectory by its ID.
         fetch_entry: Retrieves a specific trajectory pair entry from the database.
         set_preference: Updates the preference value of a specific trajectory pair entry.
         skip_pair: Marks a specific trajectory pair entry as skipped.
         get_next_entry: Retrieves the next trajectory pair entry that has not been processed.
+        fetch_entry_by_id: Retrieves a trajectory pair entry by its ID.
+        resume_after: Continues sequential access after the given entry.
+        for_task: Returns a DBManager for the namespace of a task, sharing the MongoDB process.
     """
 
-    def __init__(self, debug=True):
+    def __init__(self, wipe_on_close: bool = False, codec: Optional[PayloadCodec] = None,
+                 database_name: str = 'database', start_mongod: bool = True):
         """
         Initializes the DBManager with a MongoDB client and sets up the database and collection.
+
+        Args:
+            wipe_on_close (bool): Whether the database directory is deleted when closed. Only meant for debugging.
+            codec (Optional[PayloadCodec]): The codec new trajectories are stored with. If None, transitions are stored as lists.
+            database_name (str): The name of the MongoDB database.
+            start_mongod (bool): Whether to start the MongoDB process, False if it is already running.
         """
-        self.debug = debug
-        self.mongod_process = self._start_mongodb()
+        self.wipe_on_close = wipe_on_close
+        self.codec = codec
+        self.mongod_process = self._start_mongodb() if start_mongod else None
         self.client = MongoClient("localhost", 27017)
-        self.db = self.client['database']
+        self.db = self.client[database_name]
         self.collection = self.db.videos
+        self.trajectories = self.db.trajectories
         self.id_of_current_video = None
+        # Several refill workers may take entries concurrently.
+        self.cursor_lock = threading.Lock()
 
     def _start_mongodb(self):
         return subprocess.Popen(
@@ -54,7 +75,7 @@ class DBManager:
             Tuple[Optional[str], Optional[str]]: The inserted ID if successful, and an error message if not.
         """
         try:
-            entry = trajectory_pair.to_bson()
+            entry = trajectory_pair.to_bson(self.codec)
 
             inserted_id = self.collection.insert_one(entry).inserted_id
             return str(inserted_id), None
@@ -63,6 +84,45 @@ class DBManager:
         except Exception as e:
             return None, str(e)
 
+    def add_trajectory(self, trajectory: Trajectory) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Adds a trajectory that segment pairs can reference by its ID.
+
+        Args:
+            trajectory (Trajectory): The trajectory to be stored.
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: The inserted ID if successful, and an error message if not.
+        """
+        try:
+            inserted_id = self.trajectories.insert_one(trajectory_to_dict(trajectory, self.codec)).inserted_id
+            return str(inserted_id), None
+        except errors.ConnectionFailure:
+            return None, "Connection to DB could not be made."
+        except Exception as e:
+            return None, str(e)
+
+    def fetch_trajectory(self, trajectory_id: str) -> Tuple[Optional[Trajectory], Optional[str]]:
+        """
+        Fetches a stored trajectory by its ID.
+
+        Args:
+            trajectory_id (str): The ID returned by add_trajectory.
+
+        Returns:
+            Tuple[Optional[Trajectory], Optional[str]]: The fetched Trajectory or an error message.
+        """
+        try:
+            entry = self.trajectories.find_one({"_id": ObjectId(trajectory_id)})
+            if entry:
+                return dict_to_trajectory(entry), None
+            else:
+                return None, "No matching trajectory found."
+        except errors.ConnectionFailure:
+            return None, "Connection to DB could not be made."
+        except Exception as e:
+            return None, str(e)
+
     def fetch_entry(self, trajectory1: Trajectory, trajectory2: Trajectory) -> Tuple[Optional[TrajectoryPair], Optional[str]]:
         """
         Fetches a trajectory pair entry from the database based on given trajectories.
@@ -106,10 +166,7 @@ class DBManager:
         Returns:
             Tuple[Optional[str], Optional[str]]: Success message or error message.
         """
-        query = {
-            "trajectory1": trajectory_pair.trajectory1,
-            "trajectory2": trajectory_pair.trajectory2
-        }
+        query = pair_query(trajectory_pair)
         new_values = {"$set": {"preference": preference}}
 
         updated_result = self.collection.update_one(query, new_values)
@@ -131,10 +188,7 @@ class DBManager:
         Returns:
             Tuple[Optional[str], Optional[str]]: Success message or error message.
         """
-        query = {
-            "trajectory1": trajectory_pair.trajectory1,
-            "trajectory2": trajectory_pair.trajectory2
-        }
+        query = pair_query(trajectory_pair)
         new_values = {"$set": {"skipped": True}}
 
         updated_result = self.collection.update_one(query, new_values)
@@ -146,7 +200,23 @@ class DBManager:
         else:
             return "Entry successfully updated.", None
 
+    def for_task(self, task_id: str) -> 'DBManager':
+        """
+        Returns a DBManager for the database namespace of a task, using the MongoDB process of this DBManager.
+
+        Args:
+            task_id (str): The ID of the task, e.g. the gym env ID.
+
+        Returns:
+            DBManager: The DBManager of the task.
+        """
+        return DBManager(codec=self.codec, database_name=f"{self.db.name}_{task_namespace(task_id)}", start_mongod=False)
+
     def get_next_entry(self):
+        with self.cursor_lock:
+            return self._get_next_entry()
+
+    def _get_next_entry(self):
         try:
             base_query = {"preference": None, "skipped": False}
 
@@ -158,15 +228,7 @@ class DBManager:
 
             if entry:
                 self.id_of_current_video = entry["_id"]
-                trajectory1 = dict_to_trajectory(entry["trajectory1"])
-                trajectory2 = dict_to_trajectory(entry["trajectory2"])
-
-                trajectory_pair = TrajectoryPair(
-                    trajectory1=trajectory1,
-                    trajectory2=trajectory2,
-                    preference=entry["preference"]
-                )
-                return trajectory_pair, None
+                return self._pair_from_entry(entry)
             else:
                 return None, "No more unprocessed entries found."
         except errors.ConnectionFailure:
@@ -174,10 +236,83 @@ class DBManager:
         except Exception as e:
             return None, str(e)
 
+    def fetch_entry_by_id(self, pair_id: str) -> Tuple[Optional[TrajectoryPair], Optional[str]]:
+        """
+        Fetches a trajectory pair entry by its ID, regardless of whether it has been processed.
+
+        Args:
+            pair_id (str): The ID of the entry, as returned by add_entry.
+
+        Returns:
+            Tuple[Optional[TrajectoryPair], Optional[str]]: The fetched TrajectoryPair or an error message.
+        """
+        try:
+            entry = self.collection.find_one({"_id": ObjectId(pair_id)})
+            if entry:
+                return self._pair_from_entry(entry)
+            else:
+                return None, "No matching entry found."
+        except errors.ConnectionFailure:
+            return None, "Connection to DB could not be made."
+        except Exception as e:
+            return None, str(e)
+
+    def resume_after(self, pair_id: Optional[str]):
+        """
+        Lets get_next_entry continue after the given entry, e.g. after a restart.
+
+        Args:
+            pair_id (Optional[str]): The ID of the last entry that was handed out.
+        """
+        self.id_of_current_video = ObjectId(pair_id) if pair_id is not None else None
+
+    def _pair_from_entry(self, entry: dict) -> Tuple[Optional[TrajectoryPair], Optional[str]]:
+        if "segment1" in entry:
+            trajectory_pair, error = self._segment_pair_from_entry(entry)
+            if error:
+                return None, error
+        else:
+            trajectory_pair = TrajectoryPair(
+                trajectory1=dict_to_trajectory(entry["trajectory1"]),
+                trajectory2=dict_to_trajectory(entry["trajectory2"]),
+                preference=entry["preference"],
+                pair_id=str(entry["_id"])
+            )
+        if entry["skipped"]:
+            trajectory_pair.skip()
+        return trajectory_pair, None
+
+    def _segment_pair_from_entry(self, entry: dict) -> Tuple[Optional[TrajectoryPair], Optional[str]]:
+        segment1 = dict_to_segment(entry["segment1"])
+        segment2 = dict_to_segment(entry["segment2"])
+
+        trajectory1, error = self.fetch_trajectory(segment1.trajectory_id)
+        if error:
+            return None, error
+        if segment2.trajectory_id == segment1.trajectory_id:
+            trajectory2 = trajectory1
+        else:
+            trajectory2, error = self.fetch_trajectory(segment2.trajectory_id)
+            if error:
+                return None, error
+
+        trajectory_pair = TrajectoryPair(
+            trajectory1=trajectory1,
+            trajectory2=trajectory2,
+            preference=entry["preference"],
+            segment1=segment1,
+            segment2=segment2,
+            pair_id=str(entry["_id"])
+        )
+        return trajectory_pair, None
+
     def close_db(self):
+        if self.mongod_process is None:
+            self.client.close()
+            return
         self.mongod_process.terminate()
         self.mongod_process.wait()
-        if self.debug:
+        if self.wipe_on_close:
             db_directory = os.path.join(os.path.dirname(__file__),'..', '..', 'data', 'db')
             for filename in os.listdir(db_directory):
                 file_path = os.path.join(db_directory, filename)
@@ -198,8 +333,38 @@ def dict_to_transition(transition_dict: dict) -> Transition:
     )
 
 def dict_to_trajectory(trajectory_dict: dict) -> Trajectory:
-    transitions = [dict_to_transition(t) for t in trajectory_dict['transitions']]
+    if 'codec' in trajectory_dict:
+        codec = PayloadCodec.from_dict(trajectory_dict['codec'])
+        transitions = codec.decode_transitions(trajectory_dict['payload'])
+    else:
+        transitions = [dict_to_transition(t) for t in trajectory_dict['transitions']]
     return Trajectory(
         initial_conditions=trajectory_dict['initial_conditions'], 
         transitions=transitions
     )
+
+def dict_to_segment(segment_dict: dict) -> TrajectorySegment:
+    return TrajectorySegment(
+        trajectory_id=segment_dict['trajectory_id'],
+        start=segment_dict['start'],
+        end=segment_dict['end']
+    )
+
+def pair_query(trajectory_pair: TrajectoryPair) -> dict:
+    if trajectory_pair.pair_id is not None:
+        return {"_id": ObjectId(trajectory_pair.pair_id)}
+    if trajectory_pair.is_segment_pair:
+        return {
+            "segment1": segment_to_dict(trajectory_pair.segment1),
+            "segment2": segment_to_dict(trajectory_pair.segment2)
+        }
+    return {
+        "trajectory1": trajectory_pair.trajectory1,
+        "trajectory2": trajectory_pair.trajectory2
+    }
+
+def task_namespace(task_id: str) -> str:
+    '''
+    Returns a version of the task ID that is usable in database names and file paths.
+    '''
+    return re.sub(r'[^A-Za-z0-9_-]', '_', task_id)
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+from typing import Callable, Dict, List, Optional
+
+from src.DataHandling.buffered_queue_manager import BufferedQueueManager
+from src.DataHandling.database_manager import DBManager, task_namespace
+from src.DataHandling.queue_journal import QueueJournal
+from src.DataHandling.renderer import RendererPool
+from src.DataHandling.retention import RetentionManager
+from src.DataHandling.simulator import Simulator
+from src.DataHandling.video_extractor import VideoExtractor
+
+
+class TaskStack():
+    """
+    The components serving one task: a simulator and a renderer pool with envs of their own, a database
+    namespace, a buffered queue with its journal, and the retention of its videos.
+    """
+
+    def __init__(self, task_id: str, env_factory: Callable[[], object], db_manager: DBManager,
+                 data_folder: str = 'data', queue_size: int = 10, max_workers: int = 4):
+        """
+        Args:
+            task_id (str): The ID of the task, e.g. the gym env ID.
+            env_factory (Callable[[], object]): Creates a new env of the task in render_mode 'rgb_array'.
+            db_manager (DBManager): The DBManager of the namespace of the task.
+            data_folder (str): The folder below which the files of the task are stored.
+            queue_size (int): The maximum size of the buffered queue.
+            max_workers (int): The maximal number of refill workers and renderers.
+        """
+        self.task_id = task_id
+        self.namespace = task_namespace(task_id)
+        self.max_workers = max_workers
+        self.db_manager = db_manager
+
+        env = env_factory()
+        self.simulator = Simulator(env)
+        self.renderer_pool = RendererPool(env_factory, size=1)
+        self.video_folder = os.path.join(data_folder, 'videos', self.namespace)
+        self.video_extractor = VideoExtractor(env, renderer_pool=self.renderer_pool, trajectories_folder=self.video_folder)
+        self.journal = QueueJournal(os.path.join(data_folder, self.namespace, 'queue_journal.jsonl'))
+        self.buffered_queue = BufferedQueueManager(db_manager, self.video_extractor, n=queue_size, journal=self.journal)
+        self.retention_manager = RetentionManager(db_manager, self.buffered_queue, self.video_folder,
+                                                  archive_folder=os.path.join(data_folder, 'archive', self.namespace))
+
+    @property
+    def n_workers(self) -> int:
+        return self.buffered_queue.n_workers
+
+    def scale_to(self, n_workers: int):
+        """
+        Sets the number of refill workers and renderers of the task.
+        """
+        n_workers = min(max(1, n_workers), self.max_workers)
+        self.buffered_queue.set_workers(n_workers)
+        self.renderer_pool.resize(n_workers)
+
+    def close(self):
+        self.retention_manager.close_routine()
+        self.buffered_queue.close_routine()
+        self.renderer_pool.close()
+        self.journal.close()
+        self.db_manager.close_db()
+
+
+class EnvRegistry():
+    """
+    Holds one TaskStack per task ID, so that one server can label several tasks at once.
+
+    A background thread scales the stacks with the demand of the labelers: a task whose labelers wait
+    for or drain its queue gets another refill worker and renderer, a task that has not served a pair
+    for idle_timeout seconds is scaled down to one worker and its idle renderers (and their envs) are released.
+    """
+
+    def __init__(self, db_manager: DBManager, data_folder: str = 'data', scale_interval: float = 10,
+                 idle_timeout: float = 300, daemon: bool = True):
+        """
+        Args:
+            db_manager (DBManager): The DBManager owning the MongoDB process. Every task gets its own namespace.
+            data_folder (str): The folder below which the files of the tasks are stored.
+            scale_interval (float): The time in seconds between scaling decisions.
+            idle_timeout (float): The time in seconds without served pairs after which a task is scaled down.
+        """
+        self.db_manager = db_manager
+        self.data_folder = data_folder
+        self.scale_interval = scale_interval
+        self.idle_timeout = idle_timeout
+        self.stacks: Dict[str, TaskStack] = {}
+        self.lock = threading.Lock()
+
+        self.run = True
+        self.scaling_thread = threading.Thread(target=self.scale_loop)
+        self.scaling_thread.daemon = daemon
+        self.scaling_thread.start()
+
+    def register(self, task_id: str, env_factory: Callable[[], object], **kwargs) -> TaskStack:
+        """
+        Creates the TaskStack of a task. Registering a task twice returns the existing stack.
+
+        Args:
+            task_id (str): The ID of the task, e.g. the gym env ID.
+            env_factory (Callable[[], object]): Creates a new env of the task in render_mode 'rgb_array'.
+            **kwargs: Further arguments of TaskStack.
+
+        Returns:
+            TaskStack: The stack of the task.
+        """
+        with self.lock:
+            if task_id not in self.stacks:
+                self.stacks[task_id] = TaskStack(task_id, env_factory, self.db_manager.for_task(task_id),
+                                                 data_folder=self.data_folder, **kwargs)
+            return self.stacks[task_id]
+
+    def get(self, task_id: str) -> Optional[TaskStack]:
+        with self.lock:
+            return self.stacks.get(task_id)
+
+    def get_by_namespace(self, namespace: str) -> Optional[TaskStack]:
+        with self.lock:
+            return next((stack for stack in self.stacks.values() if stack.namespace == namespace), None)
+
+    def task_ids(self) -> List[str]:
+        with self.lock:
+            return list(self.stacks.keys())
+
+    def scale_loop(self):
+        """
+        Periodically scales all task stacks. Runs as a separate thread.
+        """
+        while self.run:
+            for task_id in self.task_ids():
+                try:
+                    self.scale(self.get(task_id))
+                except Exception as e:
+                    print(f"Error while scaling {task_id}: {e}")
+            deadline = time.time() + self.scale_interval
+            while self.run and time.time() < deadline:
+                time.sleep(min(1, self.scale_interval))
+
+    def scale(self, stack: TaskStack):
+        """
+        Scales a task stack up if labelers wait for or drain its queue, and down if it is idle.
+        """
+        buffered_queue = stack.buffered_queue
+        if time.time() - buffered_queue.last_served_at > self.idle_timeout:
+            if stack.n_workers > 1:
+                stack.scale_to(1)
+            stack.renderer_pool.release_idle()
+        elif buffered_queue.waiting > 0 or buffered_queue.get_queue_size() < buffered_queue.get_queue_max() / 2:
+            stack.scale_to(stack.n_workers + 1)
+        elif buffered_queue.get_queue_size() >= buffered_queue.get_queue_max() and stack.n_workers > 1:
+            stack.scale_to(stack.n_workers - 1)
+
+    def close(self):
+        self.run = False
+        self.scaling_thread.join()
+        for task_id in self.task_ids():
+            self.get(task_id).close()
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+from typing import Optional
+
+import numpy as np
+
+SERVE = 0
+DECIDE = 1
+SKIP = 2
+
+EVENT_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('event', 'u1'),
+    ('pair_id', 'S24'),
+    ('labeler_id', 'S32'),
+    ('preference', '<f4'),
+    ('wait', '<f4'),
+])
+
+
+class EventLog():
+    """
+    An append-only binary log of the serve and decide events of the labelers.
+
+    Every event is a fixed-size record of EVENT_DTYPE, so the whole log can be loaded into a structured
+    NumPy array at once and aggregated without Python loops. Serve events carry the time the labeler
+    waited for the queue, decide events the given preference (NaN for skips).
+    """
+
+    def __init__(self, path: str = 'data/label_events.bin'):
+        """
+        Args:
+            path (str): The path of the log file. Parent directories are created if necessary.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'ab')
+
+    def _append(self, event: int, pair_id: Optional[str], labeler_id: str, preference: float = np.nan, wait: float = 0.0):
+        record = np.array([(time.time(), event, (pair_id or '').encode(), labeler_id.encode()[:32], preference, wait)], dtype=EVENT_DTYPE)
+        with self.lock:
+            self.file.write(record.tobytes())
+            self.file.flush()
+
+    def record_serve(self, pair_id: Optional[str], labeler_id: str, wait: float):
+        """
+        Records that a pair was served to a labeler after waiting wait seconds for the queue.
+        """
+        self._append(SERVE, pair_id, labeler_id, wait=wait)
+
+    def record_decide(self, pair_id: Optional[str], labeler_id: str, preference: float):
+        """
+        Records that a labeler gave a preference for a pair.
+        """
+        self._append(DECIDE, pair_id, labeler_id, preference=preference)
+
+    def record_skip(self, pair_id: Optional[str], labeler_id: str):
+        """
+        Records that a labeler skipped a pair.
+        """
+        self._append(SKIP, pair_id, labeler_id)
+
+    def load(self, since: Optional[float] = None) -> np.ndarray:
+        """
+        Loads all events, optionally only those after since.
+
+        Returns:
+            np.ndarray: A structured array of EVENT_DTYPE.
+        """
+        with self.lock:
+            self.file.flush()
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        # A record torn by a crash is ignored.
+        data = data[:len(data) - len(data) % EVENT_DTYPE.itemsize]
+        events = np.frombuffer(data, dtype=EVENT_DTYPE)
+        if since is not None:
+            events = events[events['time'] >= since]
+        return events
+
+    def summary(self, since: Optional[float] = None) -> dict:
+        """
+        Aggregates the events into throughput statistics.
+
+        Returns:
+            dict: Labels per hour, dwell time percentiles, queue starvation time and inter-labeler agreement.
+        """
+        return summarize_events(self.load(since))
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def _percentile(values: np.ndarray, q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if len(values) else None
+
+def dwell_times(events: np.ndarray) -> np.ndarray:
+    """
+    Returns the time between serving a pair to a labeler and the labeler's decision on it, for all decisions.
+    """
+    order = np.lexsort((events['time'], events['labeler_id'], events['pair_id']))
+    events = events[order]
+    same_key = (events['pair_id'][1:] == events['pair_id'][:-1]) & (events['labeler_id'][1:] == events['labeler_id'][:-1])
+    is_dwell = same_key & (events['event'][:-1] == SERVE) & (events['event'][1:] != SERVE)
+    return (events['time'][1:] - events['time'][:-1])[is_dwell]
+
+def labels_per_hour(events: np.ndarray) -> list:
+    """
+    Returns the number of decisions (including skips) per hour, starting at the hour of the first event.
+    """
+    times = events['time'][events['event'] != SERVE]
+    if len(times) == 0:
+        return []
+    hours = ((times - events['time'].min()) // 3600).astype(np.int64)
+    return np.bincount(hours).tolist()
+
+def agreement(events: np.ndarray) -> dict:
+    """
+    Returns the pairwise agreement of labelers on pairs that were labeled by more than one labeler.
+    Only the last preference of every labeler per pair is taken into account, skips are ignored.
+    """
+    decisions = events[events['event'] == DECIDE]
+    decisions = decisions[np.argsort(decisions['time'], kind='stable')]
+    # np.unique returns the first occurrence, so reverse to keep the last decision per labeler and pair.
+    reversed_decisions = decisions[::-1]
+    keys = np.char.add(np.char.add(reversed_decisions['pair_id'], b'/'), reversed_decisions['labeler_id'])
+    _, last = np.unique(keys, return_index=True)
+    decisions = reversed_decisions[last]
+
+    pairs, pair_index, labelers_per_pair = np.unique(decisions['pair_id'], return_inverse=True, return_counts=True)
+    _, value_index, labelers_per_value = np.unique(
+        np.stack([pair_index, decisions['preference']], axis=1), axis=0, return_index=True, return_counts=True)
+
+    agreeing = np.bincount(pair_index[value_index], weights=labelers_per_value * (labelers_per_value - 1) / 2, minlength=len(pairs))
+    total = labelers_per_pair * (labelers_per_pair - 1) / 2
+    duplicated = total > 0
+    return {
+        'duplicated_pairs': int(duplicated.sum()),
+        'agreement': float(np.mean(agreeing[duplicated] / total[duplicated])) if duplicated.any() else None
+    }
+
+def summarize_events(events: np.ndarray) -> dict:
+    dwell = dwell_times(events)
+    waits = events['wait'][events['event'] == SERVE].astype(np.float64)
+    total_wait = float(waits.sum())
+    total_dwell = float(dwell.sum())
+    return {
+        'events': int(len(events)),
+        'labels': int(np.count_nonzero(events['event'] == DECIDE)),
+        'skips': int(np.count_nonzero(events['event'] == SKIP)),
+        'labelers': int(len(np.unique(events['labeler_id']))),
+        'labels_per_hour': labels_per_hour(events),
+        'dwell_p50': _percentile(dwell, 50),
+        'dwell_p95': _percentile(dwell, 95),
+        'queue_starvation_time': total_wait,
+        'queue_starvation_p95': _percentile(waits, 95),
+        # Share of the labelers' time spent waiting for the pipeline instead of labeling.
+        'queue_starvation_share': total_wait / (total_wait + total_dwell) if total_wait + total_dwell > 0 else None,
+        **agreement(events)
+    }
@@ -0,0 +1,182 @@
+import zlib
+
+import numpy as np
+
+from typing import List, Optional
+from src.DataHandling.trajectory_pair import Transition
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+COMPRESSIONS = ('none', 'zlib', 'zstd', 'lz4')
+OBSERVATION_ENCODINGS = ('raw', 'float16', 'quantized')
+
+
+class PayloadCodec():
+    """
+    Describes how the transitions of a trajectory are packed into a binary payload.
+
+    Instead of one list per transition, all states, actions, rewards and flags of a trajectory are
+    stacked into arrays and stored as compressed bytes. Actions, rewards and flags are always stored
+    losslessly, as they are needed for replaying the trajectory. Observations may be stored as float16
+    or quantized, as long as the reconstruction error stays within error_bound. Quantized observations
+    are delta encoded along the time axis before compression.
+
+    The codec is recorded in every document, so documents written with different codecs (or without
+    any codec) can be read from the same collection.
+    """
+
+    def __init__(self, compression: Optional[str] = None, shuffle: bool = True,
+                 observations: str = 'raw', error_bound: float = 1e-3):
+        """
+        Args:
+            compression (Optional[str]): One of 'none', 'zlib', 'zstd' or 'lz4'. Defaults to the best available.
+            shuffle (bool): Whether to byte-shuffle arrays before compression.
+            observations (str): One of 'raw', 'float16' or 'quantized'.
+            error_bound (float): The maximal absolute error allowed for lossy observations.
+        """
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'zlib'
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'. Choose one of {COMPRESSIONS}.")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("Compression 'zstd' requires the zstandard package.")
+        if compression == 'lz4' and lz4_frame is None:
+            raise ValueError("Compression 'lz4' requires the lz4 package.")
+        if observations not in OBSERVATION_ENCODINGS:
+            raise ValueError(f"Unknown observation encoding '{observations}'. Choose one of {OBSERVATION_ENCODINGS}.")
+        if observations != 'raw' and error_bound <= 0:
+            raise ValueError("Lossy observation encodings require a positive error bound.")
+
+        self.compression = compression
+        self.shuffle = shuffle
+        self.observations = observations
+        self.error_bound = error_bound
+
+    def to_dict(self) -> dict:
+        return {
+            'compression': self.compression,
+            'shuffle': self.shuffle,
+            'observations': self.observations,
+            'error_bound': self.error_bound
+        }
+
+    @classmethod
+    def from_dict(cls, codec_dict: dict) -> 'PayloadCodec':
+        return cls(**codec_dict)
+
+    def can_encode(self, transitions: List[Transition]) -> bool:
+        """
+        Returns whether the transitions consist of equally shaped numeric arrays, which is required for stacking.
+        """
+        if not transitions:
+            return False
+        first = transitions[0]
+        fields = (first.state, first.action, first.next_state)
+        if not all(isinstance(field, np.ndarray) and field.dtype.kind in 'biuf' for field in fields):
+            return False
+        return all(
+            isinstance(t.state, np.ndarray) and t.state.shape == first.state.shape and
+            isinstance(t.action, np.ndarray) and t.action.shape == first.action.shape and
+            isinstance(t.next_state, np.ndarray) and t.next_state.shape == first.next_state.shape
+            for t in transitions
+        )
+
+    def encode_transitions(self, transitions: List[Transition]) -> dict:
+        states = np.stack([t.state for t in transitions])
+        next_states = np.stack([t.next_state for t in transitions])
+        # next_state[i] equals state[i+1] except after resets, so only the exceptions are stored.
+        breaks = np.ones(len(transitions), dtype=bool)
+        breaks[:-1] = np.any(next_states[:-1] != states[1:], axis=tuple(range(1, states.ndim)))
+        break_indices = np.flatnonzero(breaks)
+
+        return {
+            'states': self._encode_observations(states),
+            'next_states': self._encode_observations(next_states[break_indices]),
+            'next_state_breaks': self._encode_array(break_indices.astype(np.int32)),
+            'actions': self._encode_array(np.stack([t.action for t in transitions])),
+            'rewards': self._encode_array(np.array([t.reward for t in transitions], dtype=np.float64)),
+            'terminated': self._encode_array(np.packbits([bool(t.terminated) for t in transitions]), len(transitions)),
+            'truncated': self._encode_array(np.packbits([bool(t.truncated) for t in transitions]), len(transitions)),
+        }
+
+    def decode_transitions(self, payload: dict) -> List[Transition]:
+        states = self._decode_observations(payload['states'])
+        actions = self._decode_array(payload['actions'])
+        rewards = self._decode_array(payload['rewards'])
+        terminated = np.unpackbits(self._decode_array(payload['terminated']), count=payload['terminated']['count']).astype(bool)
+        truncated = np.unpackbits(self._decode_array(payload['truncated']), count=payload['truncated']['count']).astype(bool)
+
+        next_states = np.empty_like(states)
+        next_states[:-1] = states[1:]
+        next_states[self._decode_array(payload['next_state_breaks'])] = self._decode_observations(payload['next_states'])
+
+        return [
+            Transition(states[i], actions[i], float(rewards[i]), bool(terminated[i]), bool(truncated[i]), next_states[i])
+            for i in range(len(states))
+        ]
+
+    def _encode_observations(self, observations: np.ndarray) -> dict:
+        if self.observations == 'float16' and observations.dtype.kind == 'f':
+            encoded = observations.astype(np.float16)
+            if np.max(np.abs(encoded.astype(observations.dtype) - observations), initial=0) <= self.error_bound:
+                return dict(self._encode_array(encoded), encoding='float16', observation_dtype=str(observations.dtype))
+        elif self.observations == 'quantized' and observations.dtype.kind == 'f':
+            step = 2 * self.error_bound
+            quantized = np.rint(observations / step).astype(np.int64)
+            deltas = np.diff(quantized, axis=0, prepend=np.zeros_like(quantized[:1]))
+            if np.all(np.abs(deltas) < 2**31):
+                deltas = deltas.astype(np.int32)
+            return dict(self._encode_array(deltas), encoding='quantized', observation_dtype=str(observations.dtype), step=step)
+        # Fall back to lossless storage, e.g. if the error bound cannot be kept with float16.
+        return dict(self._encode_array(observations), encoding='raw')
+
+    def _decode_observations(self, encoded: dict) -> np.ndarray:
+        array = self._decode_array(encoded)
+        if encoded['encoding'] == 'float16':
+            return array.astype(encoded['observation_dtype'])
+        elif encoded['encoding'] == 'quantized':
+            return (np.cumsum(array, axis=0, dtype=np.int64) * encoded['step']).astype(encoded['observation_dtype'])
+        return array
+
+    def _encode_array(self, array: np.ndarray, count: Optional[int] = None) -> dict:
+        array = np.ascontiguousarray(array)
+        data = array.tobytes()
+        if self.shuffle and array.itemsize > 1:
+            data = np.frombuffer(data, dtype=np.uint8).reshape(-1, array.itemsize).T.tobytes()
+        encoded = {'data': self._compress(data), 'dtype': str(array.dtype), 'shape': list(array.shape)}
+        if count is not None:
+            encoded['count'] = count
+        return encoded
+
+    def _decode_array(self, encoded: dict) -> np.ndarray:
+        dtype = np.dtype(encoded['dtype'])
+        data = self._decompress(encoded['data'])
+        if self.shuffle and dtype.itemsize > 1:
+            data = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T.tobytes()
+        return np.frombuffer(data, dtype=dtype).reshape(encoded['shape']).copy()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().compress(data)
+        elif self.compression == 'lz4':
+            return lz4_frame.compress(data)
+        elif self.compression == 'zlib':
+            return zlib.compress(data)
+        return data
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.compression == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+        elif self.compression == 'lz4':
+            return lz4_frame.decompress(data)
+        elif self.compression == 'zlib':
+            return zlib.decompress(data)
+        return data
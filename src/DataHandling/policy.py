@@ -0,0 +1,92 @@
+import collections
+
+from typing import Callable, Optional
+
+import numpy as np
+
+'''Policies that the Simulator uses to act. All policies act on batches of observations, so that the
+inference of one batch is shared by many envs.
+'''
+class Policy():
+
+    def act(self, obs_batch: np.ndarray) -> np.ndarray:
+        '''
+        Returns one action per row of obs_batch.
+        '''
+        raise NotImplementedError
+
+
+class RandomPolicy(Policy):
+    '''
+    Samples actions uniformly from the action space, like env.action_space.sample().
+    '''
+
+    def __init__(self, action_space, seed: Optional[int] = None):
+        self.action_space = action_space
+        if seed is not None:
+            self.action_space.seed(seed)
+
+    def act(self, obs_batch: np.ndarray) -> np.ndarray:
+        return np.stack([self.action_space.sample() for _ in range(len(obs_batch))])
+
+
+class CallablePolicy(Policy):
+    '''
+    Wraps a function mapping a batch of observations to a batch of actions, e.g. the forward pass of a model on the CPU.
+    '''
+
+    def __init__(self, function: Callable[[np.ndarray], np.ndarray]):
+        self.function = function
+
+    def act(self, obs_batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.function(obs_batch))
+
+
+class PerturbedPolicy(Policy):
+    '''
+    Adds Gaussian noise to the actions of another policy and clips them to the bounds of the action space.
+    Used for rollouts of perturbations of the current policy.
+    '''
+
+    def __init__(self, policy: Policy, action_space, noise_scale: float = 0.1, seed: Optional[int] = None):
+        self.policy = policy
+        self.low = action_space.low
+        self.high = action_space.high
+        self.noise_scale = noise_scale
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, obs_batch: np.ndarray) -> np.ndarray:
+        actions = self.policy.act(obs_batch)
+        noise = self.rng.normal(scale=self.noise_scale * (self.high - self.low) / 2, size=actions.shape)
+        return np.clip(actions + noise, self.low, self.high).astype(actions.dtype)
+
+
+class CachedPolicy(Policy):
+    '''
+    Caches the actions of another policy per observation batch, so that rollouts that revisit the same
+    observations (e.g. replays from the same seeds) do not run inference again. Only suitable for
+    deterministic policies. The least recently used batches are evicted once max_entries is reached.
+    '''
+
+    def __init__(self, policy: Policy, max_entries: int = 10000):
+        self.policy = policy
+        self.max_entries = max_entries
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def act(self, obs_batch: np.ndarray) -> np.ndarray:
+        obs_batch = np.ascontiguousarray(obs_batch)
+        key = (obs_batch.shape, obs_batch.dtype.str, obs_batch.tobytes())
+        actions = self.cache.get(key)
+        if actions is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return actions
+
+        self.misses += 1
+        actions = self.policy.act(obs_batch)
+        self.cache[key] = actions
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return actions
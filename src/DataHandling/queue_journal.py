@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+from typing import Dict, List, Optional
+
+QUEUED = 'queued'
+RENDERED = 'rendered'
+SERVED = 'served'
+DECIDED = 'decided'
+CURSOR = 'cursor'
+
+
+class QueueJournal():
+    """
+    A persistent append-only journal of the pairs passing through the BufferedQueueManager.
+
+    Every pair is journaled when it is taken from the database (queued), when its videos are rendered
+    and when it is served to a labeler. Once the pair is labeled or skipped it is marked as decided and
+    dropped from the journal. After a restart the journal tells which pairs were still in flight and
+    which videos can be reused, so the queue can be rebuilt without re-rendering.
+
+    Each event is one JSON line that is flushed and synced before record returns. A torn last line
+    from a crash is ignored when loading. The journal is compacted on startup.
+    """
+
+    def __init__(self, path: str = 'data/queue_journal.jsonl'):
+        """
+        Args:
+            path (str): The path of the journal file. Parent directories are created if necessary.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.pairs: Dict[str, dict] = {}
+        self.cursor: Optional[str] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._load()
+        self._compact()
+        self.file = open(self.path, 'a')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    self._apply(json.loads(line))
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash, skip it.
+                    continue
+
+    def _apply(self, record: dict):
+        event, pair_id = record['event'], record['pair_id']
+        if event == CURSOR:
+            self.cursor = pair_id
+        elif event == DECIDED:
+            self.pairs.pop(pair_id, None)
+        else:
+            if event == QUEUED:
+                self.cursor = pair_id
+            state = self.pairs.setdefault(pair_id, {})
+            state.update({key: value for key, value in record.items() if key not in ('event', 'pair_id')})
+            state['status'] = event
+
+    def _compact(self):
+        """
+        Rewrites the journal with one record per pending pair.
+        """
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as file:
+            if self.cursor is not None:
+                file.write(json.dumps({'event': CURSOR, 'pair_id': self.cursor}) + '\n')
+            for pair_id, state in self.pairs.items():
+                record = {key: value for key, value in state.items() if key != 'status'}
+                file.write(json.dumps(dict(record, event=state['status'], pair_id=pair_id)) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+    def record(self, event: str, pair_id: str, **data):
+        """
+        Appends an event for a pair to the journal.
+
+        Args:
+            event (str): One of QUEUED, RENDERED, SERVED or DECIDED.
+            pair_id (str): The database ID of the pair.
+            **data: Additional JSON-serializable data, e.g. the video file paths.
+        """
+        record = dict(data, event=event, pair_id=pair_id, time=time.time())
+        with self.lock:
+            self.file.write(json.dumps(record) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._apply(record)
+
+    def pending(self) -> List[str]:
+        """
+        Returns the IDs of all pairs that are queued, rendered or served but not yet decided, oldest first.
+
+        Returns:
+            List[str]: The IDs of the pending pairs.
+        """
+        with self.lock:
+            return list(self.pairs.keys())
+
+    def get_state(self, pair_id: str) -> Optional[dict]:
+        """
+        Returns the last journaled state of a pair, or None if the pair is not pending.
+        """
+        with self.lock:
+            state = self.pairs.get(pair_id)
+            return dict(state) if state is not None else None
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,207 @@
+import contextlib
+import ctypes.util
+import os
+import queue
+import threading
+
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def configure_headless_gl():
+    '''
+    Selects an offscreen OpenGL backend for MuJoCo if no display is available. EGL is used if a GPU
+    device exists, OSMesa (software rendering) otherwise. Has to be called before mujoco is imported,
+    i.e. before any env is created. Backends chosen by the user via MUJOCO_GL are kept.
+    '''
+    if 'MUJOCO_GL' in os.environ or os.environ.get('DISPLAY'):
+        return
+
+    if os.path.exists('/dev/dri') and ctypes.util.find_library('EGL') is not None:
+        backend = 'egl'
+    else:
+        backend = 'osmesa'
+    os.environ['MUJOCO_GL'] = backend
+    os.environ.setdefault('PYOPENGL_PLATFORM', backend)
+
+
+class Renderer():
+    '''
+    Renders the current state of an env into preallocated frame buffers.
+
+    This fallback uses env.render() and resizes the frame if the buffer has a different size.
+    '''
+
+    def __init__(self, env):
+        self.env = env
+        self._default_size: Optional[Tuple[int, int]] = None
+
+    def default_size(self) -> Tuple[int, int]:
+        '''
+        Returns the (height, width) of the frames of the env. The env has to be reset before.
+        '''
+        if self._default_size is None:
+            self._default_size = self.env.render().shape[:2]
+        return self._default_size
+
+    def render(self, out: np.ndarray):
+        '''
+        Renders the current frame into out, an RGB buffer of shape (height, width, 3).
+        '''
+        frame = self.env.render()
+        if frame.shape[:2] == out.shape[:2]:
+            out[...] = frame
+        else:
+            cv2.resize(frame, (out.shape[1], out.shape[0]), dst=out, interpolation=cv2.INTER_AREA)
+
+    def close(self):
+        self.env.close()
+
+
+class MujocoRenderer(Renderer):
+    '''
+    Renders MuJoCo envs with one long-lived offscreen context per frame size, reading the framebuffer
+    directly into the given buffer.
+    '''
+
+    def __init__(self, env):
+        super().__init__(env)
+        self._contexts: Dict[Tuple[int, int], 'mujoco.Renderer'] = {}
+
+    def default_size(self) -> Tuple[int, int]:
+        unwrapped = self.env.unwrapped
+        if hasattr(unwrapped, 'height') and hasattr(unwrapped, 'width'):
+            return unwrapped.height, unwrapped.width
+        return super().default_size()
+
+    def _context(self, height: int, width: int) -> 'mujoco.Renderer':
+        import mujoco
+
+        context = self._contexts.get((height, width))
+        if context is None:
+            model = self.env.unwrapped.model
+            # The offscreen buffer of the model has to be large enough for the requested size.
+            model.vis.global_.offheight = max(model.vis.global_.offheight, height)
+            model.vis.global_.offwidth = max(model.vis.global_.offwidth, width)
+            context = mujoco.Renderer(model, height=height, width=width)
+            self._contexts[(height, width)] = context
+        return context
+
+    def render(self, out: np.ndarray):
+        context = self._context(out.shape[0], out.shape[1])
+        mujoco_renderer = getattr(self.env.unwrapped, 'mujoco_renderer', None)
+        camera = getattr(mujoco_renderer, 'camera_id', None)
+        context.update_scene(self.env.unwrapped.data, camera=camera if camera is not None else -1)
+        context.render(out=out)
+
+    def close(self):
+        for context in self._contexts.values():
+            context.close()
+        self._contexts.clear()
+        super().close()
+
+
+def make_renderer(env) -> Renderer:
+    '''
+    Returns a MujocoRenderer for MuJoCo based envs if mujoco is installed, the fallback Renderer otherwise.
+    '''
+    unwrapped = env.unwrapped
+    if hasattr(unwrapped, 'model') and hasattr(unwrapped, 'data'):
+        try:
+            import mujoco
+            return MujocoRenderer(env)
+        except ImportError:
+            pass
+    return Renderer(env)
+
+
+class RendererPool():
+    '''
+    A pool of renderers, each owning its own env created by env_factory, that are reused across replays.
+
+    At most size renderers are created. acquire blocks until a renderer is available, so concurrent
+    replays never share an env.
+    '''
+
+    def __init__(self, env_factory: Callable[[], object], size: int = 2):
+        '''
+        Args:
+            env_factory (Callable[[], object]): Creates a new env in render_mode 'rgb_array'.
+            size (int): The maximal number of renderers.
+        '''
+        if size <= 0:
+            raise ValueError("The pool size must be positive.")
+
+        self.env_factory = env_factory
+        self.size = size
+        self.available = queue.Queue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def acquire(self):
+        renderer = self._get()
+        try:
+            yield renderer
+        finally:
+            with self.lock:
+                surplus = self.created > self.size
+                if surplus:
+                    self.created -= 1
+            if surplus:
+                renderer.close()
+            else:
+                self.available.put(renderer)
+
+    def _get(self) -> Renderer:
+        try:
+            return self.available.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if not create:
+            return self.available.get(block=True)
+
+        try:
+            return make_renderer(self.env_factory())
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    def resize(self, size: int):
+        '''
+        Sets the maximal number of renderers. Surplus idle renderers are closed right away.
+        '''
+        if size <= 0:
+            raise ValueError("The pool size must be positive.")
+        with self.lock:
+            self.size = size
+        while self.created > self.size and self._close_idle():
+            pass
+
+    def release_idle(self):
+        '''
+        Closes all idle renderers and their envs. They are created again when needed.
+        '''
+        while self._close_idle():
+            pass
+
+    def _close_idle(self) -> bool:
+        try:
+            renderer = self.available.get_nowait()
+        except queue.Empty:
+            return False
+        renderer.close()
+        with self.lock:
+            self.created -= 1
+        return True
+
+    def close(self):
+        self.release_idle()
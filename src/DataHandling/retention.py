@@ -0,0 +1,213 @@
+import datetime
+import gzip
+import os
+import threading
+import time
+
+from typing import List, Optional
+
+from bson import ObjectId, encode
+
+from src.DataHandling.buffered_queue_manager import BufferedQueueManager
+from src.DataHandling.database_manager import DBManager
+
+
+class RetentionManager():
+    """
+    Keeps the rendered videos within a disk budget and moves old trajectories out of MongoDB.
+
+    A background sweeper periodically
+        - deletes the videos of pairs that are no longer queued or served, i.e. labeled, skipped or orphaned pairs,
+        - limits the number of pairs rendered ahead to hot_pairs while the videos exceed the disk budget,
+        - archives decided pairs and unreferenced trajectories older than archive_after to gzipped BSON files
+          (restorable with mongorestore --gzip) and removes them from the database.
+
+    The sweeper is rate limited to max_bytes_per_second and only archives while the queue is full, so it
+    does not compete with the rendering of new pairs. The reclaimed bytes are reported by report.
+    """
+
+    def __init__(self, db_manager: DBManager, buffered_queue: BufferedQueueManager, video_folder: str,
+                 disk_budget: int = 2 * 1024**3, hot_pairs: int = 3, delete_decided: bool = True,
+                 archive_folder: Optional[str] = 'data/archive', archive_after: float = 7 * 24 * 3600,
+                 sweep_interval: float = 60, max_bytes_per_second: int = 50 * 1024**2,
+                 max_documents_per_sweep: int = 100, min_video_age: float = 60, daemon: bool = True):
+        """
+        Args:
+            db_manager (DBManager): The database manager whose collections are archived.
+            buffered_queue (BufferedQueueManager): The queue whose videos are in use.
+            video_folder (str): The folder the videos are written to.
+            disk_budget (int): The maximal size of all videos in bytes.
+            hot_pairs (int): The number of pairs kept rendered ahead while the disk budget is exceeded.
+            delete_decided (bool): Whether unused videos are deleted right away or only when the budget is exceeded.
+            archive_folder (Optional[str]): The folder for archived documents. None disables archiving.
+            archive_after (float): The age in seconds after which documents are archived.
+            sweep_interval (float): The time in seconds between sweeps.
+            max_bytes_per_second (int): The maximal rate at which bytes are deleted or archived.
+            max_documents_per_sweep (int): The maximal number of documents archived per sweep.
+            min_video_age (float): Videos younger than this are never deleted, as they may still be written.
+        """
+        self.db_manager = db_manager
+        self.buffered_queue = buffered_queue
+        self.video_folder = video_folder
+        self.disk_budget = disk_budget
+        self.hot_pairs = hot_pairs
+        self.delete_decided = delete_decided
+        self.archive_folder = archive_folder
+        self.archive_after = archive_after
+        self.sweep_interval = sweep_interval
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_documents_per_sweep = max_documents_per_sweep
+        self.min_video_age = min_video_age
+
+        self.reclaimed = {'videos': 0, 'archived_pairs': 0, 'archived_trajectories': 0}
+        self.reclaimed_lock = threading.Lock()
+
+        if archive_folder is not None:
+            os.makedirs(archive_folder, exist_ok=True)
+
+        self.run = True
+        self.sweeping_thread = threading.Thread(target=self.sweep_loop)
+        self.sweeping_thread.daemon = daemon
+        self.sweeping_thread.start()
+
+    def sweep_loop(self):
+        """
+        Sweeps every sweep_interval seconds. Runs as a separate thread.
+        """
+        while self.run:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error during retention sweep: {e}")
+            # Sleep in small steps, so that closing does not wait for a whole interval.
+            deadline = time.time() + self.sweep_interval
+            while self.run and time.time() < deadline:
+                time.sleep(min(1, self.sweep_interval))
+
+    def sweep(self):
+        self.sweep_videos()
+        if self.archive_folder is not None and self.buffered_queue.get_queue_size() >= self.buffered_queue.get_queue_max():
+            self.archive_documents()
+
+    def _throttle(self, n_bytes: int):
+        if self.max_bytes_per_second:
+            time.sleep(n_bytes / self.max_bytes_per_second)
+
+    def _delete(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+        self._throttle(size)
+        return size
+
+    def sweep_videos(self) -> int:
+        """
+        Deletes unused videos, oldest first, and limits the pairs rendered ahead while the budget is exceeded.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        if not os.path.isdir(self.video_folder):
+            return 0
+
+        now = time.time()
+        active = self.buffered_queue.active_videos()
+        videos = []
+        for entry in os.scandir(self.video_folder):
+            if entry.is_file() and entry.name.endswith('.mp4'):
+                stat = entry.stat()
+                videos.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+        videos.sort()
+        usage = sum(size for _, size, _ in videos)
+
+        reclaimed = 0
+        for modified, size, path in videos:
+            if path in active or now - modified < self.min_video_age:
+                continue
+            if not self.delete_decided and usage <= self.disk_budget:
+                break
+            freed = self._delete(path)
+            usage -= freed
+            reclaimed += freed
+
+        if usage > self.disk_budget:
+            for path in self.buffered_queue.limit_rendered_ahead(self.hot_pairs):
+                freed = self._delete(path)
+                usage -= freed
+                reclaimed += freed
+        elif self.buffered_queue.hot_limit is not None and usage < 0.9 * self.disk_budget:
+            self.buffered_queue.limit_rendered_ahead(None)
+
+        self._add_reclaimed('videos', reclaimed)
+        return reclaimed
+
+    def archive_documents(self) -> int:
+        """
+        Archives decided pairs and unreferenced trajectories older than archive_after and removes them from the database.
+
+        Returns:
+            int: The number of BSON bytes moved out of the database.
+        """
+        threshold = ObjectId.from_datetime(datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.archive_after))
+        decided = {"$or": [{"preference": {"$ne": None}}, {"skipped": True}]}
+
+        pairs = list(self.db_manager.collection.find({"_id": {"$lt": threshold}, **decided}).limit(self.max_documents_per_sweep))
+        archived = self._archive(self.db_manager.collection, 'pairs', pairs)
+
+        # Trajectories that undecided segment pairs still refer to must stay.
+        referenced = set()
+        for entry in self.db_manager.collection.find({"segment1": {"$exists": True}, "preference": None, "skipped": False},
+                                                     {"segment1.trajectory_id": 1, "segment2.trajectory_id": 1}):
+            referenced.add(ObjectId(entry["segment1"]["trajectory_id"]))
+            referenced.add(ObjectId(entry["segment2"]["trajectory_id"]))
+        trajectories = list(self.db_manager.trajectories.find({"_id": {"$lt": threshold, "$nin": list(referenced)}})
+                            .limit(self.max_documents_per_sweep))
+        archived_trajectories = self._archive(self.db_manager.trajectories, 'trajectories', trajectories)
+
+        self._add_reclaimed('archived_pairs', archived)
+        self._add_reclaimed('archived_trajectories', archived_trajectories)
+        return archived + archived_trajectories
+
+    def _archive(self, collection, name: str, documents: List[dict]) -> int:
+        if not documents:
+            return 0
+
+        file_name = f"{name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.bson.gz"
+        path = os.path.join(self.archive_folder, file_name)
+        n_bytes = 0
+        with gzip.open(path, 'wb') as file:
+            for document in documents:
+                data = encode(document)
+                file.write(data)
+                n_bytes += len(data)
+                self._throttle(len(data))
+        # Only remove the documents once the archive is completely written.
+        collection.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+        return n_bytes
+
+    def _add_reclaimed(self, key: str, n_bytes: int):
+        with self.reclaimed_lock:
+            self.reclaimed[key] += n_bytes
+
+    def report(self) -> dict:
+        """
+        Returns the bytes reclaimed since startup and the current video disk usage.
+        """
+        usage = 0
+        if os.path.isdir(self.video_folder):
+            usage = sum(entry.stat().st_size for entry in os.scandir(self.video_folder) if entry.is_file())
+        with self.reclaimed_lock:
+            reclaimed = dict(self.reclaimed)
+        return {
+            'reclaimed_bytes': reclaimed,
+            'video_bytes': usage,
+            'disk_budget': self.disk_budget,
+            'hot_limit': self.buffered_queue.hot_limit
+        }
+
+    def close_routine(self):
+        self.run = False
+        print("Closing retention")
+        self.sweeping_thread.join()
@@ -0,0 +1,81 @@
+from typing import List, Optional
+
+import numpy as np
+
+from src.DataHandling.trajectory_pair import Trajectory, TrajectorySegment, TrajectoryPair
+
+class SegmentSampler():
+    """
+    Samples pairs of fixed-length segments from a pool of long stored trajectories.
+
+    Segments never cross an episode boundary, so every clip shows one continuous rollout. All valid
+    start positions of the pool are computed at once and the segments are drawn from them in a
+    single vectorized draw.
+    """
+
+    def __init__(self, segment_length: int, seed: Optional[int] = None):
+        """
+        Args:
+            segment_length (int): The number of transitions per segment.
+            seed (Optional[int]): Seed for the random number generator.
+        """
+        if segment_length <= 0:
+            raise ValueError("Segment length must be positive.")
+
+        self.segment_length = segment_length
+        self.rng = np.random.default_rng(seed)
+
+    def valid_starts(self, trajectory: Trajectory) -> np.ndarray:
+        """
+        Returns all start indices of segments that lie within a single episode of the trajectory.
+
+        Args:
+            trajectory (Trajectory): The trajectory to cut segments from.
+
+        Returns:
+            np.ndarray: The valid start indices.
+        """
+        n_transitions = len(trajectory.transitions)
+        if n_transitions < self.segment_length:
+            return np.empty(0, dtype=np.int64)
+
+        dones = np.fromiter(((t.terminated or t.truncated) for t in trajectory.transitions),
+                            dtype=np.int64, count=n_transitions)
+        # The last transition of a segment may end the episode, all others may not.
+        done_counts = np.concatenate(([0], np.cumsum(dones)))
+        starts = np.arange(n_transitions - self.segment_length + 1)
+        inner_dones = done_counts[starts + self.segment_length - 1] - done_counts[starts]
+        return starts[inner_dones == 0]
+
+    def sample_pairs(self, trajectory_ids: List[str], trajectories: List[Trajectory], n_pairs: int) -> List[TrajectoryPair]:
+        """
+        Samples pairs of segments from the given pool of trajectories.
+
+        Args:
+            trajectory_ids (List[str]): The database ids of the trajectories.
+            trajectories (List[Trajectory]): The trajectories of the pool.
+            n_pairs (int): The number of pairs to sample.
+
+        Returns:
+            List[TrajectoryPair]: The sampled segment pairs. May be fewer than n_pairs if the pool
+            does not contain enough distinct segments.
+        """
+        starts = [self.valid_starts(trajectory) for trajectory in trajectories]
+        pool_index = np.repeat(np.arange(len(trajectories)), [len(s) for s in starts])
+        pool_start = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+        n_pairs = min(n_pairs, len(pool_start) // 2)
+        if n_pairs == 0:
+            return []
+
+        chosen = self.rng.choice(len(pool_start), size=2 * n_pairs, replace=False).reshape(n_pairs, 2)
+        chosen_index = pool_index[chosen]
+        chosen_start = pool_start[chosen]
+
+        pairs = []
+        for (index1, index2), (start1, start2) in zip(chosen_index, chosen_start):
+            segment1 = TrajectorySegment(trajectory_ids[index1], int(start1), int(start1) + self.segment_length)
+            segment2 = TrajectorySegment(trajectory_ids[index2], int(start2), int(start2) + self.segment_length)
+            pairs.append(TrajectoryPair(trajectories[index1], trajectories[index2],
+                                        segment1=segment1, segment2=segment2))
+        return pairs
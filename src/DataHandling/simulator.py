@@ -1,18 +1,34 @@
 import math
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 import gymnasium as gym
 import numpy as np
+from src.DataHandling.policy import Policy, RandomPolicy
 from src.DataHandling.trajectory_pair import Transition, Trajectory
 
 ''' A class for simulating gym environments and receiving trajectories.
 '''
 class Simulator():
     
-    def __init__(self, env, frame_rate: int = 50, run_speed_factor: float = 1.0):
+    def __init__(self, env, frame_rate: int = 50, run_speed_factor: float = 1.0, snapshot_interval: int = 0,
+                 policy: Optional[Policy] = None):
+        '''
+        If snapshot_interval > 0 and the env exposes its simulator state, a snapshot of the state is
+        stored every snapshot_interval steps, so that segments can be replayed without simulating
+        from the start of the episode.
+
+        The policy chooses the actions of the rollouts. If None, actions are sampled from the action space.
+        '''
         self.env = env
         self.frame_rate = frame_rate
         self.run_speed_factor = run_speed_factor
+        self.snapshot_interval = snapshot_interval
+        self.policy = policy
+
+    def _act(self, observation) -> Any:
+        if self.policy is None:
+            return self.env.action_space.sample()
+        return self.policy.act(np.asarray(observation)[None])[0]
 
     def simulate_for_n_seconds(self, seconds: int = 10, seed=42) -> Tuple[List[np.ndarray], Trajectory]:
         frames = []
@@ -20,12 +36,17 @@ class Simulator():
         observation, info = self.env.reset(seed = seed)
         initial_condition = {'seed': [seed]}
         rng = np.random.default_rng(seed)
+        take_snapshots = self.snapshot_interval > 0 and supports_env_state(self.env)
+        if take_snapshots:
+            initial_condition['snapshots'] = []
 
         # floor necessary, as run_speed_factor is float 
         max_frames = math.floor(seconds * self.frame_rate * self.run_speed_factor)
 
-        for _ in range(max_frames):
-            action = self.env.action_space.sample()
+        for step in range(max_frames):
+            if take_snapshots and step % self.snapshot_interval == 0:
+                initial_condition['snapshots'].append({'step': step, 'state': get_env_state(self.env)})
+            action = self._act(observation)
             frames.append(self.env.render())
             current_obs = observation
             observation, reward, terminated, truncated, info = self.env.step(action)
@@ -33,8 +54,8 @@ class Simulator():
             transitions.append(Transition(current_obs, action, reward, terminated, truncated, observation))
 
             if terminated or truncated:
-                seed = rng.integers(0, 100)
-                self.env.reset(seed = seed)
+                seed = int(rng.integers(0, 100))
+                observation, info = self.env.reset(seed = seed)
                 initial_condition['seed'].append(seed)
 
         return frames, Trajectory(initial_condition, transitions)
@@ -50,7 +71,7 @@ class Simulator():
 
         for _ in range(max_time_steps):
             frames.append(self.env.render())
-            action = self.env.action_space.sample()
+            action = self._act(observation)
             
             current_obs = observation
 
@@ -61,6 +82,66 @@ class Simulator():
             if terminated or truncated:
                 break
         
-        trajectory = Trajectory(initial_conditions, transitions)
+        trajectory = Trajectory(initial_condition, transitions)
 
         return frames, trajectory
+
+    def simulate_batch(self, envs: Sequence, seconds: int = 10, seeds: Optional[Sequence[int]] = None) -> List[Trajectory]:
+        '''
+        Simulates many envs in lockstep without rendering, so that one policy inference per step serves all envs.
+        Returns one trajectory per env, replayable like the ones of simulate_for_n_seconds.
+
+        envs may be a list of envs or a gymnasium SyncVectorEnv. Resets of finished episodes are seeded
+        explicitly per env instead of relying on the autoreset of vector envs, so that they can be replayed.
+        '''
+        envs = list(getattr(envs, 'envs', envs))
+        if seeds is None:
+            seeds = range(len(envs))
+        policy = self.policy if self.policy is not None else RandomPolicy(envs[0].action_space)
+
+        rngs = [np.random.default_rng(seed) for seed in seeds]
+        initial_conditions = [{'seed': [int(seed)]} for seed in seeds]
+        transitions = [[] for _ in envs]
+        observations = [env.reset(seed=int(seed))[0] for env, seed in zip(envs, seeds)]
+        take_snapshots = self.snapshot_interval > 0 and all(supports_env_state(env) for env in envs)
+        if take_snapshots:
+            for initial_condition in initial_conditions:
+                initial_condition['snapshots'] = []
+
+        max_frames = math.floor(seconds * self.frame_rate * self.run_speed_factor)
+
+        for step in range(max_frames):
+            if take_snapshots and step % self.snapshot_interval == 0:
+                for env, initial_condition in zip(envs, initial_conditions):
+                    initial_condition['snapshots'].append({'step': step, 'state': get_env_state(env)})
+
+            actions = policy.act(np.stack(observations))
+
+            for i, env in enumerate(envs):
+                current_obs = observations[i]
+                observation, reward, terminated, truncated, _ = env.step(actions[i])
+                transitions[i].append(Transition(current_obs, actions[i], reward, terminated, truncated, observation))
+
+                if terminated or truncated:
+                    seed = int(rngs[i].integers(0, 100))
+                    observation, _ = env.reset(seed=seed)
+                    initial_conditions[i]['seed'].append(seed)
+                observations[i] = observation
+
+        return [Trajectory(initial_condition, env_transitions)
+                for initial_condition, env_transitions in zip(initial_conditions, transitions)]
+
+
+def supports_env_state(env) -> bool:
+    '''
+    Returns whether the state of the env can be read and restored (e.g. MuJoCo based envs).
+    '''
+    unwrapped = env.unwrapped
+    return hasattr(unwrapped, 'set_state') and hasattr(unwrapped, 'data')
+
+def get_env_state(env) -> dict:
+    data = env.unwrapped.data
+    return {'qpos': data.qpos.tolist(), 'qvel': data.qvel.tolist()}
+
+def set_env_state(env, state: dict):
+    env.unwrapped.set_state(np.array(state['qpos']), np.array(state['qvel']))
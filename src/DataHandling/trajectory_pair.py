@@ -5,12 +5,22 @@ from typing import Any, List, NamedTuple, Tuple
 
 Transition = namedtuple('Transition', ['state', 'action', 'reward', 'terminated', 'truncated', 'next_state'])
 Trajectory = namedtuple('Trajectory', ['initial_conditions', 'transitions'])
+TrajectorySegment = namedtuple('TrajectorySegment', ['trajectory_id', 'start', 'end'])
 
 
 class TrajectoryPair():
-    def __init__(self, trajectory1: Trajectory, trajectory2: Trajectory, preference=None):
+    def __init__(self, trajectory1: Trajectory, trajectory2: Trajectory, preference=None,
+                 segment1: TrajectorySegment = None, segment2: TrajectorySegment = None, pair_id: str = None):
+        '''
+        If segments are given, the pair compares the clips [start, end) of the stored trajectories
+        referenced by the segments instead of the full trajectories. pair_id is the database ID of
+        the pair, if it was loaded from the database.
+        '''
         self._trajectory1 = trajectory1
         self._trajectory2 = trajectory2
+        self._segment1 = segment1
+        self._segment2 = segment2
+        self._pair_id = pair_id
 
         self._preference = preference
         self._skipped = False
@@ -41,6 +51,22 @@ class TrajectoryPair():
     def trajectory2(self):
         return self._trajectory2
 
+    @property
+    def segment1(self):
+        return self._segment1
+
+    @property
+    def segment2(self):
+        return self._segment2
+
+    @property
+    def pair_id(self):
+        return self._pair_id
+
+    @property
+    def is_segment_pair(self):
+        return self._segment1 is not None and self._segment2 is not None
+
     @property
     def preference(self):
         return self._preference
@@ -54,12 +80,25 @@ class TrajectoryPair():
             return NotImplemented
 
         return (self.trajectory1 == other.trajectory1 and 
-                self.trajectory2 == other.trajectory2)
+                self.trajectory2 == other.trajectory2 and
+                self.segment1 == other.segment1 and
+                self.segment2 == other.segment2)
     
-    def to_bson(self):
+    def to_bson(self, codec=None):
+        '''
+        If a PayloadCodec is given, the transitions of the trajectories are stored as compressed binary payloads.
+        '''
+        if self.is_segment_pair:
+            # Only the references are stored, the trajectories live in their own collection.
+            return {
+                'segment1': segment_to_dict(self._segment1),
+                'segment2': segment_to_dict(self._segment2),
+                'preference': self._preference,
+                'skipped': self._skipped
+            }
         return {
-            'trajectory1': trajectory_to_dict(self._trajectory1),
-            'trajectory2': trajectory_to_dict(self._trajectory2),
+            'trajectory1': trajectory_to_dict(self._trajectory1, codec),
+            'trajectory2': trajectory_to_dict(self._trajectory2, codec),
             'preference': self._preference,
             'skipped': self._skipped
         }
@@ -89,9 +128,22 @@ def transition_to_dict(transition: Transition) -> dict:
         'next_state_dtype': next_state_dtype
     }
 
-def trajectory_to_dict(trajectory: Trajectory) -> dict:
+def trajectory_to_dict(trajectory: Trajectory, codec=None) -> dict:
+    if codec is not None and codec.can_encode(trajectory.transitions):
+        return {
+            'initial_conditions': trajectory.initial_conditions,
+            'codec': codec.to_dict(),
+            'payload': codec.encode_transitions(trajectory.transitions)
+        }
     transitions_dict = [transition_to_dict(t) for t in trajectory.transitions]
     return {
         'initial_conditions': trajectory.initial_conditions,
         'transitions': transitions_dict
     }
+
+def segment_to_dict(segment: TrajectorySegment) -> dict:
+    return {
+        'trajectory_id': segment.trajectory_id,
+        'start': int(segment.start),
+        'end': int(segment.end)
+    }
@@ -1,20 +1,31 @@
+import contextlib
 import datetime
 import math
-from typing import Any, List, Tuple
+import os
+from typing import Any, List, Optional, Tuple
 
 import cv2
 import gymnasium as gym
 import numpy as np
 import yaml
-from src.DataHandling.trajectory_pair import Transition, Trajectory
+from src.DataHandling.renderer import Renderer, RendererPool, make_renderer
+from src.DataHandling.simulator import set_env_state, supports_env_state
+from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectorySegment
 
 '''A class for generating videos from trajectories of Gym Environments.
 '''
 class VideoExtractor():
 
-    def __init__(self, env, frame_rate: int = 50, run_speed_factor: float = 1.0):
+    def __init__(self, env, frame_rate: int = 50, run_speed_factor: float = 1.0,
+                 renderer_pool: Optional[RendererPool] = None, output_frame_rate: Optional[float] = None,
+                 trajectories_folder: Optional[str] = None):
         '''
         Assumes that the Gym environment is in render_mode 'rgb_array'. 
+
+        If a renderer_pool is given, replays acquire a renderer (and its env) from the pool instead of
+        using env. If output_frame_rate is lower than the simulation frame rate, only every k-th step
+        is rendered and the video is encoded at the lower frame rate. trajectories_folder overrides the
+        folder from config.yaml the videos are written to.
         '''
         if env.render_mode != 'rgb_array':
             raise ValueError("Environment render mode must be 'rgb_array'")
@@ -22,6 +33,11 @@ class VideoExtractor():
         self.env = env
         self.frame_rate = frame_rate
         self.run_speed_factor = run_speed_factor
+        self.renderer_pool = renderer_pool
+        self.renderer = make_renderer(env) if renderer_pool is None else None
+
+        fps = frame_rate * run_speed_factor
+        self.frame_skip = max(1, round(fps / output_frame_rate)) if output_frame_rate else 1
 
         try:
             with open('config.yaml', 'r') as file:
@@ -30,9 +46,12 @@ class VideoExtractor():
         except (FileNotFoundError, yaml.YAMLError) as e:
             print(f"Error loading config file: {e}")
             self.trajectories_folder = '/res/trajectories'
+        if trajectories_folder is not None:
+            self.trajectories_folder = trajectories_folder
+        os.makedirs(self.trajectories_folder, exist_ok=True)
 
-    def generate_video(self, frames: List[np.ndarray], file_name: str = "trajectory", add_timestamp: bool = True) -> str:
-        if not frames:
+    def generate_video(self, frames: np.ndarray, file_name: str = "trajectory", add_timestamp: bool = True) -> str:
+        if len(frames) == 0:
             raise ValueError("The frames list is empty. Cannot generate video.")
 
         height, width, layers = frames[0].shape
@@ -44,31 +63,89 @@ class VideoExtractor():
 
         if add_timestamp:
             # Adds timestamp to chosen file name
-            file_name = f"{file_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-        fps = self.frame_rate*self.run_speed_factor
+            file_name = f"{file_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.mp4"
+        fps = self.frame_rate*self.run_speed_factor/self.frame_skip
         video = cv2.VideoWriter(file_name, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
 
         for frame in frames:
-            video.write(cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2BGR))
+            video.write(cv2.cvtColor(np.asarray(frame), cv2.COLOR_RGB2BGR))
         video.release()
 
         return file_name
 
-    def recreate_frames_from_trajectory(self, trajectory: Trajectory) -> List[np.ndarray]:
+    def recreate_frames_from_trajectory(self, trajectory: Trajectory, width: Optional[int] = None, height: Optional[int] = None) -> np.ndarray:
+        '''
+        Replays the trajectory and renders every frame_skip-th step into an array of shape (n_frames, height, width, 3).
+        The size defaults to the render size of the env.
+        '''
         initial_condition, transitions = trajectory
         seeds = initial_condition['seed']
-        frames = []
-        self.env.reset(seed=seeds[0])
-        ctr = 0
 
-        for state, action, _, terminated, truncated, _ in transitions:
-            self.env.step(action) 
-            frames.append(self.env.render())
+        with self._acquire_renderer() as renderer:
+            env = renderer.env
+            env.reset(seed=seeds[0])
+            frames = self._allocate_frames(renderer, len(transitions), width, height)
+            ctr = 0
+
+            for i, (state, action, _, terminated, truncated, _) in enumerate(transitions):
+                env.step(action) 
+                if i % self.frame_skip == 0:
+                    renderer.render(frames[i // self.frame_skip])
 
-            if terminated or truncated:
-                ctr += 1
-                seed = seeds[ctr]
-                self.env.reset(seed=seed)
+                if terminated or truncated:
+                    ctr += 1
+                    seed = seeds[ctr]
+                    env.reset(seed=seed)
 
         return frames
 
+    def recreate_frames_from_segment(self, trajectory: Trajectory, segment: TrajectorySegment,
+                                     width: Optional[int] = None, height: Optional[int] = None) -> np.ndarray:
+        '''
+        Renders only the frames of the transitions [segment.start, segment.end) of the trajectory.
+        '''
+        _, transitions = trajectory
+
+        with self._acquire_renderer() as renderer:
+            self._seek(renderer.env, trajectory, segment.start)
+            frames = self._allocate_frames(renderer, segment.end - segment.start, width, height)
+
+            for i, (_, action, _, _, _, _) in enumerate(transitions[segment.start:segment.end]):
+                renderer.env.step(action)
+                if i % self.frame_skip == 0:
+                    renderer.render(frames[i // self.frame_skip])
+
+        return frames
+
+    def _acquire_renderer(self):
+        if self.renderer_pool is not None:
+            return self.renderer_pool.acquire()
+        return contextlib.nullcontext(self.renderer)
+
+    def _allocate_frames(self, renderer: Renderer, n_steps: int, width: Optional[int], height: Optional[int]) -> np.ndarray:
+        default_height, default_width = renderer.default_size()
+        n_frames = math.ceil(n_steps / self.frame_skip)
+        return np.empty((n_frames, height or default_height, width or default_width, 3), dtype=np.uint8)
+
+    def _seek(self, env, trajectory: Trajectory, start: int):
+        '''
+        Brings the env into the state before transition start without rendering. Restores the latest
+        snapshot of the episode if there is one, else replays the episode from its reset.
+        '''
+        initial_condition, transitions = trajectory
+        dones = np.fromiter(((t.terminated or t.truncated) for t in transitions[:start]), dtype=bool, count=start)
+        done_indices = np.flatnonzero(dones)
+        episode = len(done_indices)
+        position = int(done_indices[-1]) + 1 if episode else 0
+
+        env.reset(seed=initial_condition['seed'][episode])
+
+        snapshots = [snapshot for snapshot in initial_condition.get('snapshots', [])
+                     if position <= snapshot['step'] <= start]
+        if snapshots and supports_env_state(env):
+            snapshot = max(snapshots, key=lambda snapshot: snapshot['step'])
+            set_env_state(env, snapshot['state'])
+            position = snapshot['step']
+
+        for transition in transitions[position:start]:
+            env.step(transition.action)
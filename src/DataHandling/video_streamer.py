@@ -1,18 +1,48 @@
+from typing import Optional
+
 from src.DataHandling.trajectory_pair import Trajectory, TrajectoryPair
 from src.DataHandling.simulator import Simulator
 from src.DataHandling.database_manager import DBManager
+from src.DataHandling.segment_sampler import SegmentSampler
 
 class VideoStreamer():
 
-    def __init__(self, db_manager: DBManager, simulator: Simulator, max_entries: int = 3):
+    def __init__(self, db_manager: DBManager, simulator: Simulator, max_entries: int = 3,
+                 segment_length: Optional[int] = None, n_rollouts: int = 2, rollout_seconds: int = 10):
+        '''
+        If segment_length is set, max_entries pairs of segment_length transitions are sampled from
+        n_rollouts stored rollouts of rollout_seconds each, instead of simulating two full rollouts per pair.
+        '''
         self.db_manager = db_manager
         self.simulator = simulator
         self.max_entries = max_entries
-        self.stream_env()
+        self.segment_length = segment_length
+        self.n_rollouts = n_rollouts
+        self.rollout_seconds = rollout_seconds
+        if segment_length is None:
+            self.stream_env()
+        else:
+            self.stream_segments()
         print("Done Streaming.")
-    
+
     def stream_env(self):
         for _ in range(self.max_entries):
             _, trajectory1 = self.simulator.simulate_for_n_seconds(3)
             _, trajectory2 = self.simulator.simulate_for_n_seconds(3)
-            print(self.db_manager.add_entry(TrajectoryPair(trajectory1, trajectory2)))
\ No newline at end of file
+            print(self.db_manager.add_entry(TrajectoryPair(trajectory1, trajectory2)))
+
+    def stream_segments(self):
+        trajectory_ids = []
+        trajectories = []
+        for seed in range(self.n_rollouts):
+            _, trajectory = self.simulator.simulate_for_n_seconds(self.rollout_seconds, seed=seed)
+            trajectory_id, error = self.db_manager.add_trajectory(trajectory)
+            if error:
+                print(error)
+                continue
+            trajectory_ids.append(trajectory_id)
+            trajectories.append(trajectory)
+
+        sampler = SegmentSampler(self.segment_length)
+        for trajectory_pair in sampler.sample_pairs(trajectory_ids, trajectories, self.max_entries):
+            print(self.db_manager.add_entry(trajectory_pair))
@@ -6,34 +6,59 @@ import yaml
 import time
 import traceback
 import subprocess
+
+from src.DataHandling.renderer import configure_headless_gl
+configure_headless_gl()
+
 import fancy_gym
 import gymnasium as gym
 
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, jsonify, request, render_template, send_from_directory
 from flask_cors import CORS
 
 from src.DataHandling.database_manager import DBManager
+from src.DataHandling.env_registry import EnvRegistry
+from src.DataHandling.event_log import EventLog
+from src.DataHandling.payload_codec import PayloadCodec
 from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectoryPair
-from src.DataHandling.simulator import Simulator
-from src.DataHandling.buffered_queue_manager import BufferedQueueManager
-from src.DataHandling.video_extractor import VideoExtractor
 from src.DataHandling.video_streamer import VideoStreamer
 
 
-env = gym.make('fancy/AirHockey-3dof-hit-v0', render_mode="rgb_array", width=600, height=400)
+DEFAULT_TASKS = ['fancy/AirHockey-3dof-hit-v0']
+
+def load_task_ids():
+    if os.path.exists('config.yaml'):
+        with open('config.yaml', 'r') as file:
+            config = yaml.safe_load(file) or {}
+        return config.get('tasks', DEFAULT_TASKS)
+    return DEFAULT_TASKS
+
+def make_env_factory(task_id):
+    def make_env():
+        return gym.make(task_id, render_mode="rgb_array", width=600, height=400)
+    return make_env
 
-video_extractor = VideoExtractor(env)
-db_manager = DBManager()
-simulator = Simulator(env)
-video_streamer = VideoStreamer(db_manager=db_manager, simulator=simulator, max_entries=3)
-time.sleep(5)
-buffered_queue = BufferedQueueManager(db_manager, video_extractor, n=10)
+db_manager = DBManager(codec=PayloadCodec())
+registry = EnvRegistry(db_manager)
+for task_id in load_task_ids():
+    stack = registry.register(task_id, make_env_factory(task_id))
+    VideoStreamer(db_manager=stack.db_manager, simulator=stack.simulator, max_entries=3)
 
-current_entry = None
+event_log = EventLog('data/label_events.bin')
+
+# The entry currently labeled, per task
+current_entries = {}
 
 app = Flask(__name__)
 CORS(app)
 
+def get_labeler_id() -> str:
+    return request.cookies.get('labeler_id') or request.remote_addr or 'anonymous'
+
+def get_task_stack():
+    task_id = request.cookies.get('task')
+    return registry.get(task_id) or registry.get(registry.task_ids()[0])
+
 @app.route('/')
 def index():
     config_path = 'config.yaml'
@@ -51,7 +76,17 @@ def index():
         'allowEditing': config.get('allowEditing', 'off') == 'on'
     }
 
-    return render_template('index.html', config=config_status)
+    return render_template('index.html', config=config_status, tasks=registry.task_ids(), selected_task=get_task_stack().task_id)
+
+@app.route('/select-task', methods=['POST'])
+def select_task():
+    task_id = request.form.get('task')
+    if registry.get(task_id) is None:
+        return jsonify({"success": False, "message": f"Unknown task {task_id}."}), 404
+
+    response = jsonify({"success": True, "message": f"Selected task {task_id}."})
+    response.set_cookie('task', task_id)
+    return response, 200
 
 @app.route('/next-stage-url')
 def next_stage():
@@ -68,40 +103,76 @@ def next_stage():
 
 @app.route('/get_current_video_pair')
 def get_next_video_pair():
-    global current_entry
+    stack = get_task_stack()
     try:
-        current_entry = buffered_queue.get_next_entry()
-        _, video_file_path_1, video_file_path_2 = current_entry
+        start = time.time()
+        current_entry = stack.buffered_queue.get_next_entry()
+        current_entries[stack.task_id] = current_entry
+        trajectory_pair, video_file_path_1, video_file_path_2 = current_entry
+        event_log.record_serve(trajectory_pair.pair_id, get_labeler_id(), wait=time.time() - start)
         print(current_entry)
 
         return jsonify({
-            "video1": video_file_path_1, 
-            "video2":video_file_path_2
+            "video1": f"/videos/{stack.namespace}/{os.path.basename(video_file_path_1)}", 
+            "video2": f"/videos/{stack.namespace}/{os.path.basename(video_file_path_2)}"
             }), 201
     except IndexError:
         return jsonify({"message": "The queue is empty"}), 500
 
 @app.route('/update_preference', methods=['POST'])
 def update_preference():
-    global current_entry
+    stack = get_task_stack()
 
     preference = request.form.get('preference')
 
-    trajectory_pair, _, _ = current_entry
-    db_manager.set_preference(trajectory_pair, int(preference))
+    trajectory_pair, _, _ = current_entries[stack.task_id]
+    stack.db_manager.set_preference(trajectory_pair, int(preference))
+    stack.buffered_queue.mark_decided(trajectory_pair)
+    event_log.record_decide(trajectory_pair.pair_id, get_labeler_id(), float(preference))
     return jsonify({"success": True, "message": "Preference updated successfully."}), 200
 
 @app.route('/skip_video_pair')
 def skip_pair():
-    global current_entry
+    stack = get_task_stack()
     try: 
-        trajectory_pair, _, _ = current_entry
-        db_manager.skip_pair(trajectory_pair)
+        trajectory_pair, _, _ = current_entries[stack.task_id]
+        stack.db_manager.skip_pair(trajectory_pair)
+        stack.buffered_queue.mark_decided(trajectory_pair)
+        event_log.record_skip(trajectory_pair.pair_id, get_labeler_id())
         return jsonify({"success": True, "message": "Video pair skipped successfully."}), 200
     except Exception as e:
         print(f"Error skipping video pair: {e}")
         return jsonify({"success": False, "message": "Failed to skip video pair."}), 500
 
+@app.route('/videos/<namespace>/<path:file_name>')
+def video(namespace, file_name):
+    stack = registry.get_by_namespace(namespace)
+    if stack is None:
+        return jsonify({"message": "Unknown task."}), 404
+    return send_from_directory(os.path.abspath(stack.video_folder), file_name)
+
+@app.route('/retention')
+def retention():
+    return jsonify({task_id: registry.get(task_id).retention_manager.report() for task_id in registry.task_ids()}), 200
+
+@app.route('/tasks')
+def tasks():
+    return jsonify({
+        task_id: {
+            'workers': registry.get(task_id).n_workers,
+            'queue_size': registry.get(task_id).buffered_queue.get_queue_size()
+        } for task_id in registry.task_ids()
+    }), 200
+
+@app.route('/analytics')
+def analytics():
+    try:
+        since = request.args.get('since', type=float)
+        return jsonify(event_log.summary(since)), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/update-config', methods=['POST'])
 def update_config():
     try:
@@ -3,6 +3,7 @@ import random
 import string
 import time
 from src.DataHandling.buffered_queue_manager import BufferedQueueManager
+from src.DataHandling.queue_journal import QueueJournal, QUEUED, RENDERED, SERVED
 from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectoryPair
 
 class MockDBManager:
@@ -50,3 +51,49 @@ def test_data_content(queue_manager):
     test_trajectory = Trajectory('test_data', [test_transition])
     trajectory_pair = TrajectoryPair(test_trajectory, test_trajectory)
     assert trajectory == trajectory_pair
+
+class MockRecoveryDBManager:
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.resumed_after = None
+
+    def fetch_entry_by_id(self, pair_id):
+        if pair_id in self.pairs:
+            return self.pairs[pair_id], None
+        return None, "No matching entry found."
+
+    def get_next_entry(self):
+        return None, "No more unprocessed entries found."
+
+    def resume_after(self, pair_id):
+        self.resumed_after = pair_id
+
+def test_recovery_from_journal(tmp_path):
+    test_transition = Transition('test_state', 'test_action', 'test_reward', False, False, 'test_next_state')
+    test_trajectory = Trajectory('test_data', [test_transition])
+    pending_pair = TrajectoryPair(test_trajectory, test_trajectory, pair_id='a')
+    labeled_pair = TrajectoryPair(test_trajectory, test_trajectory, preference=1, pair_id='b')
+
+    video1, video2 = tmp_path / 'a1.mp4', tmp_path / 'a2.mp4'
+    video1.touch()
+    video2.touch()
+    journal = QueueJournal(str(tmp_path / 'journal.jsonl'))
+    journal.record(QUEUED, 'a')
+    journal.record(RENDERED, 'a', video1=str(video1), video2=str(video2))
+    journal.record(SERVED, 'a')
+    journal.record(QUEUED, 'b')
+
+    db_manager = MockRecoveryDBManager({'a': pending_pair, 'b': labeled_pair})
+    queue_manager = BufferedQueueManager(db_manager, MockVideoExtractor(), n=3, sleep_interval=0, daemon=False, journal=journal)
+    trajectory_pair, recovered_video1, recovered_video2 = queue_manager.get_next_entry()
+    time.sleep(0.5)
+    queue_manager.close_routine()
+
+    assert db_manager.resumed_after == 'b'
+    assert trajectory_pair.pair_id == 'a'
+    assert (recovered_video1, recovered_video2) == (str(video1), str(video2))
+    assert queue_manager.get_queue_size() == 0
+    assert journal.pending() == ['a']
+
+    queue_manager.mark_decided(trajectory_pair)
+    assert journal.pending() == []
@@ -0,0 +1,98 @@
+import time
+
+from src.DataHandling.buffered_queue_manager import BufferedQueueManager
+from src.DataHandling.database_manager import task_namespace
+from src.DataHandling.env_registry import EnvRegistry
+from src.DataHandling.renderer import RendererPool
+
+class MockEnv:
+    render_mode = 'rgb_array'
+
+    def __init__(self):
+        self.closed = False
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def close(self):
+        self.closed = True
+
+class MockBufferedQueue:
+    def __init__(self, size, max_size, waiting=0, idle_for=0):
+        self.size = size
+        self.max_size = max_size
+        self.waiting = waiting
+        self.last_served_at = time.time() - idle_for
+
+    def get_queue_size(self):
+        return self.size
+
+    def get_queue_max(self):
+        return self.max_size
+
+class MockTaskStack:
+    def __init__(self, buffered_queue, n_workers=1):
+        self.buffered_queue = buffered_queue
+        self.n_workers = n_workers
+        self.renderer_pool = RendererPool(MockEnv, size=n_workers)
+        with self.renderer_pool.acquire():
+            pass
+
+    def scale_to(self, n_workers):
+        self.n_workers = n_workers
+
+class MockDBManager:
+    def get_next_entry(self):
+        return None, "No more unprocessed entries found."
+
+def make_registry():
+    registry = EnvRegistry(None, scale_interval=3600, idle_timeout=60)
+    registry.close()
+    return registry
+
+def test_task_namespace():
+    assert task_namespace('fancy/AirHockey-3dof-hit-v0') == 'fancy_AirHockey-3dof-hit-v0'
+
+def test_busy_task_scales_up():
+    registry = make_registry()
+    waiting_stack = MockTaskStack(MockBufferedQueue(size=5, max_size=10, waiting=1))
+    draining_stack = MockTaskStack(MockBufferedQueue(size=2, max_size=10))
+    registry.scale(waiting_stack)
+    registry.scale(draining_stack)
+    assert waiting_stack.n_workers == 2
+    assert draining_stack.n_workers == 2
+
+def test_full_task_scales_down():
+    registry = make_registry()
+    stack = MockTaskStack(MockBufferedQueue(size=10, max_size=10), n_workers=3)
+    registry.scale(stack)
+    assert stack.n_workers == 2
+
+def test_idle_task_releases_renderers():
+    registry = make_registry()
+    stack = MockTaskStack(MockBufferedQueue(size=10, max_size=10, idle_for=120), n_workers=3)
+    registry.scale(stack)
+    assert stack.n_workers == 1
+    assert stack.renderer_pool.created == 0
+
+def test_renderer_pool_resize_closes_surplus_renderers():
+    pool = RendererPool(MockEnv, size=2)
+    with pool.acquire() as renderer1:
+        with pool.acquire() as renderer2:
+            pool.resize(1)
+        assert renderer2.env.closed
+    assert not renderer1.env.closed
+    assert pool.created == 1
+
+def test_set_workers():
+    queue_manager = BufferedQueueManager(MockDBManager(), None, n=3, sleep_interval=0, daemon=False, n_workers=3)
+    assert len(queue_manager.workers) == 3
+
+    queue_manager.set_workers(1)
+    time.sleep(0.2)
+    assert sum(worker.is_alive() for worker in queue_manager.workers) == 1
+
+    queue_manager.set_workers(2)
+    assert len(queue_manager.workers) == 2
+    queue_manager.close_routine()
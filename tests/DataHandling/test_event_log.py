@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.DataHandling.event_log import EventLog, EVENT_DTYPE, SERVE, DECIDE, SKIP, summarize_events
+
+def make_events(records):
+    return np.array([(t, event, pair_id, labeler_id, preference, wait) for t, event, pair_id, labeler_id, preference, wait in records],
+                    dtype=EVENT_DTYPE)
+
+def test_dwell_and_starvation():
+    events = make_events([
+        (0.0, SERVE, b'a', b'alice', np.nan, 2.0),
+        (10.0, DECIDE, b'a', b'alice', 0.0, 0.0),
+        (12.0, SERVE, b'b', b'alice', np.nan, 6.0),
+        (42.0, SKIP, b'b', b'alice', np.nan, 0.0),
+        (3700.0, SERVE, b'c', b'alice', np.nan, 0.0),
+    ])
+    summary = summarize_events(events)
+
+    assert summary['labels'] == 1
+    assert summary['skips'] == 1
+    assert summary['labels_per_hour'] == [2]
+    assert summary['dwell_p50'] == 20.0
+    assert summary['queue_starvation_time'] == 8.0
+    assert summary['queue_starvation_share'] == 8.0 / 48.0
+
+def test_agreement_on_duplicated_pairs():
+    events = make_events([
+        (0.0, DECIDE, b'a', b'alice', 0.0, 0.0),
+        (1.0, DECIDE, b'a', b'bob', 0.0, 0.0),
+        (2.0, DECIDE, b'a', b'carol', 1.0, 0.0),
+        (3.0, DECIDE, b'b', b'alice', 1.0, 0.0),
+        # bob labels the pair again, only the last decision counts
+        (4.0, DECIDE, b'b', b'bob', 0.0, 0.0),
+        (5.0, DECIDE, b'b', b'bob', 1.0, 0.0),
+        (6.0, DECIDE, b'c', b'alice', 1.0, 0.0),
+    ])
+    summary = summarize_events(events)
+
+    assert summary['duplicated_pairs'] == 2
+    assert summary['agreement'] == (1 / 3 + 1) / 2
+
+def test_log_roundtrip(tmp_path):
+    event_log = EventLog(str(tmp_path / 'events.bin'))
+    event_log.record_serve('a', 'alice', wait=1.5)
+    event_log.record_decide('a', 'alice', 1.0)
+    event_log.record_skip('b', 'alice')
+    event_log.close()
+
+    with open(tmp_path / 'events.bin', 'ab') as file:
+        file.write(b'torn')
+
+    events = EventLog(str(tmp_path / 'events.bin')).load()
+    assert events['event'].tolist() == [SERVE, DECIDE, SKIP]
+    assert events['pair_id'].tolist() == [b'a', b'a', b'b']
+    assert events['wait'][0] == 1.5
+    assert np.isnan(events['preference'][2])
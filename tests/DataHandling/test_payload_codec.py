@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from src.DataHandling.database_manager import dict_to_trajectory
+from src.DataHandling.payload_codec import PayloadCodec
+from src.DataHandling.trajectory_pair import Transition, Trajectory, trajectory_to_dict
+
+def make_trajectory(n_transitions=50, reset_at=20):
+    rng = np.random.default_rng(0)
+    transitions = []
+    state = rng.normal(size=6)
+    for i in range(n_transitions):
+        next_state = state + rng.normal(scale=0.01, size=6)
+        action = rng.uniform(-1, 1, size=3).astype(np.float32)
+        transitions.append(Transition(state, action, float(rng.normal()), i == reset_at, False, next_state))
+        state = rng.normal(size=6) if i == reset_at else next_state
+    return Trajectory({'seed': [42, 7]}, transitions)
+
+def assert_actions_exact(original, decoded):
+    for t1, t2 in zip(original.transitions, decoded.transitions):
+        assert np.array_equal(t1.action, t2.action)
+        assert t1.action.dtype == t2.action.dtype
+        assert t1.reward == t2.reward
+        assert t1.terminated == t2.terminated
+        assert t1.truncated == t2.truncated
+
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_lossless_roundtrip(shuffle):
+    trajectory = make_trajectory()
+    decoded = dict_to_trajectory(trajectory_to_dict(trajectory, PayloadCodec(compression='zlib', shuffle=shuffle)))
+
+    assert decoded.initial_conditions == trajectory.initial_conditions
+    assert_actions_exact(trajectory, decoded)
+    for t1, t2 in zip(trajectory.transitions, decoded.transitions):
+        assert np.array_equal(t1.state, t2.state)
+        assert np.array_equal(t1.next_state, t2.next_state)
+
+@pytest.mark.parametrize("observations", ["float16", "quantized"])
+def test_lossy_observations_within_error_bound(observations):
+    trajectory = make_trajectory()
+    codec = PayloadCodec(compression='zlib', observations=observations, error_bound=1e-2)
+    decoded = dict_to_trajectory(trajectory_to_dict(trajectory, codec))
+
+    assert_actions_exact(trajectory, decoded)
+    for t1, t2 in zip(trajectory.transitions, decoded.transitions):
+        assert np.max(np.abs(t1.state - t2.state)) <= 1e-2 + 1e-9
+        assert np.max(np.abs(t1.next_state - t2.next_state)) <= 1e-2 + 1e-9
+
+def test_float16_falls_back_to_raw_if_error_bound_is_violated():
+    trajectory = make_trajectory()
+    codec = PayloadCodec(compression='none', observations='float16', error_bound=1e-9)
+    trajectory_dict = trajectory_to_dict(trajectory, codec)
+
+    assert trajectory_dict['payload']['states']['encoding'] == 'raw'
+    decoded = dict_to_trajectory(trajectory_dict)
+    assert np.array_equal(decoded.transitions[0].state, trajectory.transitions[0].state)
+
+def test_payload_is_smaller_than_lists():
+    trajectory = make_trajectory(n_transitions=500)
+    codec = PayloadCodec(compression='zlib', observations='quantized', error_bound=1e-3)
+    payload = trajectory_to_dict(trajectory, codec)['payload']
+    payload_size = sum(len(array['data']) for array in payload.values())
+
+    assert payload_size * 5 < len(str(trajectory_to_dict(trajectory)['transitions']))
+
+def test_documents_without_codec_stay_readable():
+    test_transition = Transition('test_state', 'test_action', 'test_reward', False, False, 'test_next_state')
+    test_trajectory = Trajectory('test_data', [test_transition])
+    trajectory_dict = trajectory_to_dict(test_trajectory, PayloadCodec(compression='zlib'))
+
+    assert 'codec' not in trajectory_dict
+    assert 'transitions' in trajectory_dict
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        PayloadCodec(compression='brotli')
@@ -0,0 +1,48 @@
+import os
+
+from src.DataHandling.queue_journal import QueueJournal, QUEUED, RENDERED, SERVED, DECIDED
+
+def test_pending_pairs_survive_restart(tmp_path):
+    path = os.path.join(tmp_path, 'journal.jsonl')
+    journal = QueueJournal(path)
+    journal.record(QUEUED, 'a')
+    journal.record(RENDERED, 'a', video1='a1.mp4', video2='a2.mp4')
+    journal.record(QUEUED, 'b')
+    journal.record(SERVED, 'a')
+    journal.record(QUEUED, 'c')
+    journal.record(DECIDED, 'c')
+    journal.close()
+
+    restarted = QueueJournal(path)
+    assert restarted.pending() == ['a', 'b']
+    assert restarted.cursor == 'c'
+    state = restarted.get_state('a')
+    assert state['status'] == SERVED
+    assert state['video1'] == 'a1.mp4'
+    assert state['video2'] == 'a2.mp4'
+    assert restarted.get_state('c') is None
+    restarted.close()
+
+def test_compaction_keeps_cursor(tmp_path):
+    path = os.path.join(tmp_path, 'journal.jsonl')
+    journal = QueueJournal(path)
+    journal.record(QUEUED, 'a')
+    journal.record(DECIDED, 'a')
+    journal.close()
+
+    compacted = QueueJournal(path)
+    compacted.close()
+    with open(path, 'r') as file:
+        assert len(file.readlines()) == 1
+
+    assert QueueJournal(path).cursor == 'a'
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = os.path.join(tmp_path, 'journal.jsonl')
+    journal = QueueJournal(path)
+    journal.record(QUEUED, 'a')
+    journal.close()
+    with open(path, 'a') as file:
+        file.write('{"event": "decided", "pai')
+
+    assert QueueJournal(path).pending() == ['a']
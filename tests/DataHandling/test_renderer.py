@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.DataHandling.renderer import Renderer, RendererPool, make_renderer
+from src.DataHandling.trajectory_pair import Transition, Trajectory
+from src.DataHandling.video_extractor import VideoExtractor
+
+class MockEnv:
+    render_mode = 'rgb_array'
+
+    def __init__(self, height=40, width=60):
+        self.height = height
+        self.width = width
+        self.steps = 0
+        self.closed = False
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def reset(self, seed=None):
+        self.steps = 0
+        return None, {}
+
+    def step(self, action):
+        self.steps += 1
+
+    def render(self):
+        return np.full((self.height, self.width, 3), self.steps, dtype=np.uint8)
+
+    def close(self):
+        self.closed = True
+
+def make_trajectory(n_transitions):
+    transitions = [Transition(None, np.zeros(2), 0.0, False, False, None) for _ in range(n_transitions)]
+    return Trajectory({'seed': [42]}, transitions)
+
+def test_make_renderer_falls_back_to_env_render():
+    assert type(make_renderer(MockEnv())) is Renderer
+
+def test_render_into_buffer_with_resize():
+    renderer = Renderer(MockEnv())
+    out = np.zeros((20, 30, 3), dtype=np.uint8)
+    renderer.env.step(None)
+    renderer.render(out)
+    assert np.all(out == 1)
+    assert renderer.default_size() == (40, 60)
+
+def test_pool_reuses_renderers():
+    created = []
+    def env_factory():
+        created.append(MockEnv())
+        return created[-1]
+
+    pool = RendererPool(env_factory, size=2)
+    with pool.acquire() as renderer1:
+        with pool.acquire() as renderer2:
+            assert renderer1 is not renderer2
+    with pool.acquire() as renderer3:
+        assert renderer3 in (renderer1, renderer2)
+    assert len(created) == 2
+
+    pool.close()
+    assert all(env.closed for env in created)
+
+def test_pool_blocks_when_exhausted():
+    pool = RendererPool(MockEnv, size=1)
+    acquired = threading.Event()
+
+    def acquire():
+        with pool.acquire():
+            acquired.set()
+
+    with pool.acquire():
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(1)
+    thread.join()
+    assert pool.created == 1
+
+def test_invalid_pool_size():
+    with pytest.raises(ValueError):
+        RendererPool(MockEnv, size=0)
+
+def test_frame_skip_and_size_override():
+    video_extractor = VideoExtractor(MockEnv(), frame_rate=50, renderer_pool=RendererPool(MockEnv), output_frame_rate=25)
+    frames = video_extractor.recreate_frames_from_trajectory(make_trajectory(9), width=30, height=20)
+
+    assert video_extractor.frame_skip == 2
+    assert frames.shape == (5, 20, 30, 3)
+    assert [frame[0, 0, 0] for frame in frames] == [1, 3, 5, 7, 9]
@@ -0,0 +1,101 @@
+import os
+import time
+
+from src.DataHandling.buffered_queue_manager import BufferedQueueManager
+from src.DataHandling.retention import RetentionManager
+from src.DataHandling.trajectory_pair import Transition, Trajectory, TrajectoryPair
+
+class MockBufferedQueue:
+    def __init__(self, active):
+        self.active = {os.path.abspath(video) for video in active}
+        self.hot_limit = None
+        self.evicted = []
+
+    def active_videos(self):
+        return self.active
+
+    def limit_rendered_ahead(self, hot_limit):
+        self.hot_limit = hot_limit
+        return self.evicted if hot_limit is not None else []
+
+    def get_queue_size(self):
+        return 0
+
+    def get_queue_max(self):
+        return 1
+
+class MockDBManager:
+    def get_next_entry(self):
+        return None, "No more unprocessed entries found."
+
+class MockVideoExtractor:
+    def __init__(self):
+        self.rendered = 0
+
+    def recreate_frames_from_trajectory(self, trajectory):
+        pass
+
+    def generate_video(self, frames):
+        self.rendered += 1
+        return f"rendered_{self.rendered}.mp4"
+
+def write_video(folder, name, size, age):
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as file:
+        file.write(b'0' * size)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return path
+
+def make_retention_manager(buffered_queue, video_folder, **kwargs):
+    retention_manager = RetentionManager(None, buffered_queue, str(video_folder), archive_folder=None,
+                                         sweep_interval=3600, max_bytes_per_second=0, **kwargs)
+    retention_manager.close_routine()
+    return retention_manager
+
+def test_unused_videos_are_deleted(tmp_path):
+    served = write_video(tmp_path, 'served.mp4', 100, age=120)
+    labeled = write_video(tmp_path, 'labeled.mp4', 100, age=120)
+    writing = write_video(tmp_path, 'writing.mp4', 100, age=0)
+
+    retention_manager = make_retention_manager(MockBufferedQueue([served]), tmp_path)
+    retention_manager.sweep_videos()
+
+    assert os.path.exists(served)
+    assert not os.path.exists(labeled)
+    assert os.path.exists(writing)
+    assert retention_manager.report()['reclaimed_bytes']['videos'] == 100
+
+def test_budget_limits_pairs_rendered_ahead(tmp_path):
+    queued = [write_video(tmp_path, f'queued_{i}.mp4', 100, age=120) for i in range(4)]
+    buffered_queue = MockBufferedQueue(queued)
+    buffered_queue.evicted = queued[2:]
+
+    retention_manager = make_retention_manager(buffered_queue, tmp_path, disk_budget=150, hot_pairs=1)
+    retention_manager.sweep_videos()
+
+    assert buffered_queue.hot_limit == 1
+    assert [os.path.exists(video) for video in queued] == [True, True, False, False]
+
+    retention_manager.disk_budget = 1000
+    retention_manager.sweep_videos()
+    assert buffered_queue.hot_limit is None
+
+def test_limit_rendered_ahead_evicts_and_rerenders():
+    test_transition = Transition('test_state', 'test_action', 'test_reward', False, False, 'test_next_state')
+    test_trajectory = Trajectory('test_data', [test_transition])
+    video_extractor = MockVideoExtractor()
+    queue_manager = BufferedQueueManager(MockDBManager(), video_extractor, n=3, sleep_interval=0, daemon=False)
+    for i in range(3):
+        queue_manager.buffered_queue.put((TrajectoryPair(test_trajectory, test_trajectory), f'{i}_1.mp4', f'{i}_2.mp4'))
+
+    evicted_videos = queue_manager.limit_rendered_ahead(1)
+    assert evicted_videos == ['1_1.mp4', '1_2.mp4', '2_1.mp4', '2_2.mp4']
+    assert queue_manager.get_queue_size() == 1
+    assert os.path.abspath('0_1.mp4') in queue_manager.active_videos()
+
+    queue_manager.limit_rendered_ahead(None)
+    time.sleep(0.5)
+    queue_manager.close_routine()
+    assert queue_manager.get_queue_size() == 3
+    assert video_extractor.rendered == 4
@@ -0,0 +1,44 @@
+import pytest
+
+from src.DataHandling.segment_sampler import SegmentSampler
+from src.DataHandling.trajectory_pair import Transition, Trajectory
+
+def make_trajectory(n_transitions, done_indices=()):
+    transitions = [Transition('test_state', 'test_action', 'test_reward', i in done_indices, False, 'test_next_state')
+                   for i in range(n_transitions)]
+    return Trajectory({'seed': [42]}, transitions)
+
+def test_valid_starts_without_episode_end():
+    sampler = SegmentSampler(segment_length=3)
+    assert sampler.valid_starts(make_trajectory(5)).tolist() == [0, 1, 2]
+
+def test_valid_starts_do_not_cross_episode_end():
+    sampler = SegmentSampler(segment_length=3)
+    # The episode ends after transition 3, segments may end on it but not contain it earlier.
+    assert sampler.valid_starts(make_trajectory(8, done_indices={3})).tolist() == [0, 1, 4, 5]
+
+def test_valid_starts_of_short_trajectory():
+    sampler = SegmentSampler(segment_length=10)
+    assert len(sampler.valid_starts(make_trajectory(5))) == 0
+
+def test_sample_pairs():
+    sampler = SegmentSampler(segment_length=4, seed=0)
+    trajectories = [make_trajectory(20), make_trajectory(30, done_indices={10})]
+    pairs = sampler.sample_pairs(['id1', 'id2'], trajectories, n_pairs=5)
+
+    assert len(pairs) == 5
+    for pair in pairs:
+        assert pair.is_segment_pair
+        assert pair.segment1 != pair.segment2
+        for segment in (pair.segment1, pair.segment2):
+            assert segment.trajectory_id in ('id1', 'id2')
+            assert segment.end - segment.start == 4
+
+def test_sample_pairs_limited_by_pool():
+    sampler = SegmentSampler(segment_length=4, seed=0)
+    pairs = sampler.sample_pairs(['id1'], [make_trajectory(5)], n_pairs=5)
+    assert len(pairs) == 1
+
+def test_invalid_segment_length():
+    with pytest.raises(ValueError):
+        SegmentSampler(segment_length=0)
@@ -0,0 +1,73 @@
+import gymnasium as gym
+import numpy as np
+
+from src.DataHandling.policy import CachedPolicy, CallablePolicy, PerturbedPolicy, RandomPolicy
+from src.DataHandling.simulator import Simulator
+
+def make_envs(n):
+    return [gym.make('Pendulum-v1', max_episode_steps=20) for _ in range(n)]
+
+def zero_policy(obs_batch):
+    return np.zeros((len(obs_batch), 1), dtype=np.float32)
+
+def test_simulate_batch():
+    simulator = Simulator(None, frame_rate=10, policy=CallablePolicy(zero_policy))
+    trajectories = simulator.simulate_batch(make_envs(3), seconds=5, seeds=[0, 1, 2])
+
+    assert len(trajectories) == 3
+    for seed, trajectory in zip([0, 1, 2], trajectories):
+        assert len(trajectory.transitions) == 50
+        # Episodes are truncated after 20 steps, every reset is recorded
+        assert trajectory.initial_conditions['seed'][0] == seed
+        assert len(trajectory.initial_conditions['seed']) == 3
+        assert all(np.array_equal(t.action, [0.0]) for t in trajectory.transitions)
+
+def test_simulate_batch_is_reproducible():
+    simulator = Simulator(None, frame_rate=10, policy=CallablePolicy(zero_policy))
+    trajectories1 = simulator.simulate_batch(make_envs(2), seconds=3, seeds=[5, 6])
+    trajectories2 = simulator.simulate_batch(gym.vector.SyncVectorEnv([lambda: gym.make('Pendulum-v1', max_episode_steps=20)] * 2), seconds=3, seeds=[5, 6])
+
+    for trajectory1, trajectory2 in zip(trajectories1, trajectories2):
+        assert trajectory1.initial_conditions == trajectory2.initial_conditions
+        for t1, t2 in zip(trajectory1.transitions, trajectory2.transitions):
+            assert np.array_equal(t1.state, t2.state)
+
+def test_simulate_with_policy():
+    env = gym.make('Pendulum-v1', max_episode_steps=20)
+    simulator = Simulator(env, policy=CallablePolicy(zero_policy))
+    _, trajectory = simulator.simulate_episode(seed=0)
+
+    assert len(trajectory.transitions) == 20
+    assert trajectory.initial_conditions == {'seed': [0]}
+    assert all(np.array_equal(t.action, [0.0]) for t in trajectory.transitions)
+
+def test_cached_policy():
+    calls = []
+    def policy(obs_batch):
+        calls.append(len(obs_batch))
+        return zero_policy(obs_batch)
+
+    cached_policy = CachedPolicy(CallablePolicy(policy), max_entries=1)
+    obs_batch = np.ones((4, 3))
+    cached_policy.act(obs_batch)
+    cached_policy.act(obs_batch.copy())
+    assert calls == [4]
+    assert (cached_policy.hits, cached_policy.misses) == (1, 1)
+
+    cached_policy.act(np.zeros((4, 3)))
+    cached_policy.act(obs_batch)
+    assert len(calls) == 3
+
+def test_perturbed_policy_stays_in_bounds():
+    action_space = gym.spaces.Box(-1.0, 1.0, shape=(2,), dtype=np.float32)
+    policy = PerturbedPolicy(CallablePolicy(lambda obs: np.ones((len(obs), 2), dtype=np.float32)), action_space, noise_scale=1.0, seed=0)
+    actions = policy.act(np.zeros((100, 3)))
+
+    assert actions.shape == (100, 2)
+    assert np.all(actions <= 1.0) and np.all(actions >= -1.0)
+    assert not np.all(actions == 1.0)
+
+def test_random_policy_batch():
+    action_space = gym.spaces.Box(-1.0, 1.0, shape=(2,), dtype=np.float32)
+    actions = RandomPolicy(action_space, seed=0).act(np.zeros((5, 3)))
+    assert actions.shape == (5, 2)